@@ -2,10 +2,13 @@
 # hypothesis generation project
 #
 
-import papers.entrez as entrez
-import papers.converter as converter
-import papers.files as files
+# The papers modules are imported inside the functions that use them, so running one
+# step does not pay for importing the others (requests, lxml, ...)
+#
+
 def fetch_papers():
+    import papers.entrez as entrez
+    
     ids = ["32792685",
            "4970894",
            "3913061",
@@ -15,9 +18,12 @@ def fetch_papers():
     e = entrez.Entrez()
     e.fetch(ids=ids, db="pmc", retmode="xml", rettype="xml", retry_failed=False)
 
-def convert_papers():
-    converter = converter.Converter()
-    converter.convert(doc_type="paper", format="txt")
+def convert_papers(xml_dir: str, paper_dir: str, author_dir: str, references_dir: str):
+    import papers.converter as converter
+    
+    conv = converter.XMLConverter(xml_dir=xml_dir, paper_dir=paper_dir, author_dir=author_dir, 
+                                  references_dir=references_dir, format="txt")
+    conv.convert_all(doc_type="paper")
 
     
 
@@ -1,9 +1,74 @@
 import os
+from collections import deque
 from pathlib import Path
-from papers.doc import XmlToDoc, Html2Doc
-from typing import List, Set
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import lru_cache
+from itertools import islice
+from lxml import etree as ET
+from papers.doc import XmlToDoc, _XML_PARSER, _write_bytes
+from typing import Dict, List, Optional, Set, Tuple
 import time
 
+
+# Directories already created by this process
+_MKDIR_CACHE: Set[str] = set()
+
+
+def _ensure_dir(path: Path) -> None:
+    """Create a directory (and its parents) unless this process already did."""
+    key = str(path)
+    if key not in _MKDIR_CACHE:
+        path.mkdir(parents=True, exist_ok=True)
+        _MKDIR_CACHE.add(key)
+
+
+# Writes in flight or queued in convert_all: one per writer thread plus two waiting
+_WRITER_THREADS = 2
+_MAX_PENDING_WRITES = _WRITER_THREADS + 2
+
+# Conversions submitted at once in convert_all, per worker process. With the pending writes,
+# these bound the number of rendered documents held in memory, even on a slow disk
+_TASKS_PER_WORKER = 2
+
+
+def _wait_for_write(write, xml_file: Path) -> None:
+    """Wait for a background write of convert_all to finish and report its error, if any."""
+    error = write.exception()
+    if error is not None:
+        print(f"\nError writing {xml_file.name}: {error}")
+
+
+# Stylesheet producing the same text as XmlToDoc.paper_to_text_without_metadata()
+_PAPER_XSLT_PATH = Path(__file__).with_name("pmc_to_text.xsl")
+
+
+@lru_cache(maxsize=None)
+def _get_paper_xslt() -> ET.XSLT:
+    """Compile the paper-to-text stylesheet once per process."""
+    return ET.XSLT(ET.parse(str(_PAPER_XSLT_PATH)))
+
+
+def _convert_one(task: Tuple[str, str, str]) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Convert a single XML file. Runs in a worker process of XMLConverter.convert_all.
+    
+    Plain paper text without metadata is produced by the compiled XSLT stylesheet;
+    all other doc types and formats go through XmlToDoc.
+    
+    Args:
+        task: Tuple of (xml_path, doc_type, format)
+    
+    Returns:
+        Tuple of (encoded file contents, error message). The error message is None on success.
+    """
+    xml_path, doc_type, format = task
+    try:
+        if format == "txt" and doc_type == "paper_without_metadata":
+            return bytes(_get_paper_xslt()(ET.parse(xml_path, parser=_XML_PARSER))), None
+        return XmlToDoc(xml_path).to_bytes(doc_type=doc_type, format=format), None
+    except Exception as e:
+        return None, str(e)
+
 class XMLConverter:
     """Convert all PMC XML files in a directory to text or JSON format."""
     
@@ -30,54 +95,79 @@ class XMLConverter:
         self.format         = format
         
         # Create output directories if they don't exist
-        self.paper_dir.mkdir(parents=True, exist_ok=True)
-        self.author_dir.mkdir(parents=True, exist_ok=True)
-        self.references_dir.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(self.paper_dir)
+        _ensure_dir(self.author_dir)
+        _ensure_dir(self.references_dir)
     
     
-    def _get_pending_files(self, remove_existing: bool = False, doc_type: str = "paper") -> List[Path]:
-        """Get list of XML files that need to be converted."""
-        xml_files = list(self.xml_dir.glob("*.xml"))
-        if doc_type == "paper":
-            output_dir = self.paper_dir
+    def _get_output_dir(self, doc_type: str) -> Path:
+        """Get the output directory for a document type."""
+        if doc_type in ("paper", "paper_with_metadata", "paper_without_metadata"):
+            return self.paper_dir
         elif doc_type == "author":
-            output_dir = self.author_dir
+            return self.author_dir
         elif doc_type == "references":
-            output_dir = self.references_dir
+            return self.references_dir
+        raise ValueError(f"Unknown doc_type: {doc_type}")
+    
+    
+    @staticmethod
+    def _list_files(directory: Path, suffix: str) -> List[os.DirEntry]:
+        """List the files in a directory ending with suffix, hidden ones included as with Path.glob, without a stat per entry."""
+        with os.scandir(directory) as entries:
+            return [entry for entry in entries if entry.name.endswith(suffix) and entry.is_file()]
+    
+
+    def _get_pending_files(self, remove_existing: bool = False, doc_type: str = "paper") -> List[Path]:
+        """Get list of XML files that need to be converted."""
+        xml_entries = self._list_files(self.xml_dir, ".xml")
+        output_dir = self._get_output_dir(doc_type)
+        output_suffix = f".{self.format}"
         
         if remove_existing:
             # Delete all files with matching format in output directory
-            file_pattern = f"*.{self.format}"
-            for file in output_dir.glob(file_pattern):
-                file.unlink()
-            return xml_files
+            for entry in self._list_files(output_dir, output_suffix):
+                os.unlink(entry.path)
+            return [self.xml_dir / entry.name for entry in xml_entries]
         
-        # OPTIMIZATION 1: Build a set of existing output filenames (without extension)
+        # OPTIMIZATION 1: Map existing output filenames (without extension) to their modification time
         # This changes O(n²) lookups to O(n) lookups
-        existing_stems: Set[str] = {
-            f.stem for f in output_dir.glob(f"*.{self.format}")
+        existing_mtimes: Dict[str, float] = {
+            entry.name[:-len(output_suffix)]: entry.stat().st_mtime
+            for entry in self._list_files(output_dir, output_suffix)
         }
         
         # OPTIMIZATION 2: Use list comprehension instead of loop + append
+        # A file is pending if it has no output yet, or if the XML changed after its output was written.
+        # Path objects are only built for the files that still need converting
         pending_files = [
-            xml_file for xml_file in xml_files 
-            if xml_file.stem not in existing_stems
+            self.xml_dir / entry.name for entry in xml_entries
+            if entry.stat().st_mtime > existing_mtimes.get(entry.name[:-len(".xml")], float("-inf"))
         ]
         
         # print how many files are converted out of total
-        print(f"Already converted {len(xml_files) - len(pending_files)}/{len(xml_files)} files")
+        print(f"Already converted {len(xml_entries) - len(pending_files)}/{len(xml_entries)} files")
             
         return pending_files
     
     
-    def convert_all(self, verbose: bool = True, doc_type: str = "paper_without_metadata", remove_existing: bool = False):
-        """Convert all pending XML files to text format."""
-        if doc_type == "paper_with_metadata" or doc_type == "paper_without_metadata" or doc_type == "paper":
-            doc_type_check = "paper"
-        else:
-            doc_type_check = doc_type
+    def convert_all(self, verbose: bool = True, doc_type: str = "paper_without_metadata", remove_existing: bool = False, max_workers: int = None):
+        """
+        Convert all pending XML files to text format.
+        
+        Files are converted in parallel by a pool of worker processes. The converted
+        documents are written to disk by background threads, so writing one file
+        overlaps with parsing the next ones. Only a few conversions per worker are submitted
+        at a time and only a few writes are pending, so memory does not grow with the number of files.
         
-        pending_files = self._get_pending_files(remove_existing=remove_existing, doc_type=doc_type_check)
+        Args:
+            verbose: Print progress information
+            doc_type: Type of document to save (paper, paper_with_metadata, paper_without_metadata, author, references)
+            remove_existing: Delete existing output files and convert everything again
+            max_workers: Number of worker processes. Defaults to the number of CPUs.
+        """
+        pending_files = self._get_pending_files(remove_existing=remove_existing, doc_type=doc_type)
+        output_dir = self._get_output_dir(doc_type)
         total_files = len(pending_files)
         
         if verbose:
@@ -85,44 +175,40 @@ class XMLConverter:
         
         start_time = time.time()
         
-        for i, xml_file in enumerate(pending_files, 1):
-            if verbose:
-                current_time = time.time()
-                elapsed_time = current_time - start_time
-                
-                # Calculate progress metrics
-                progress = i / total_files
-                if progress > 0:
-                    eta = elapsed_time / progress - elapsed_time
-                    eta_str = f"{int(eta // 60)}m {int(eta % 60)}s"
-                else:
-                    eta_str = "calculating..."
+        with ProcessPoolExecutor(max_workers=max_workers) as executor, ThreadPoolExecutor(max_workers=_WRITER_THREADS) as writer:
+            tasks = iter(pending_files)
+            max_in_flight = (max_workers or os.cpu_count() or 1) * _TASKS_PER_WORKER
+            in_flight = {}
+            writes = deque()
+            i = 0
+            while True:
+                # Top up the window of submitted conversions. A finished conversion is dropped
+                # from it once its result is taken, so its document is freed after the write
+                for xml_file in islice(tasks, max_in_flight - len(in_flight)):
+                    in_flight[executor.submit(_convert_one, (str(xml_file), doc_type, self.format))] = xml_file
+                if not in_flight:
+                    break
                 
-                # Format elapsed time string
-                elapsed_str = f"{int(elapsed_time // 60)}m {int(elapsed_time % 60)}s"
-                
-                # Create progress bar
-                bar_length = 30
-                arrow = '=' * int(round(progress * bar_length) - 1) + '>'
-                spaces = ' ' * (bar_length - len(arrow))
-                progress_text = f"\r[{arrow}{spaces}] {i}/{total_files} ({progress:.1%}) | Time: {elapsed_str} | ETA: {eta_str}"
-                
-                # Print progress bar (overwrite same line)
-                print(progress_text, end='', flush=True)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    xml_file = in_flight.pop(future)
+                    data, error = future.result()
+                    if error is not None:
+                        print(f"\nError converting {xml_file.name}: {error}")
+                    elif data is not None:
+                        filename = output_dir / f"{xml_file.stem}.{self.format}"
+                        writes.append((writer.submit(_write_bytes, str(filename), data), xml_file))
+                        
+                        # Bounded write queue: wait for the oldest write once too many are pending
+                        while len(writes) > _MAX_PENDING_WRITES:
+                            _wait_for_write(*writes.popleft())
+                    
+                    i += 1
+                    if verbose:
+                        self._print_progress(i, total_files, start_time)
             
-            try:
-                # Convert file
-                xml_converter = XmlToDoc(str(xml_file))
-                if doc_type == "paper" or doc_type == "paper_with_metadata" or doc_type == "paper_without_metadata":
-                    filename = self.paper_dir / f"{xml_file.stem}.{self.format}"
-                elif doc_type == "author":
-                    filename = self.author_dir / f"{xml_file.stem}.{self.format}"
-                elif doc_type == "references":  
-                    filename = self.references_dir / f"{xml_file.stem}.{self.format}"
-                xml_converter.save_to_file(str(filename), doc_type=doc_type, format=self.format)
-                
-            except Exception as e:
-                print(f"\nError converting {xml_file.name}: {str(e)}")
+            while writes:
+                _wait_for_write(*writes.popleft())
         
         # Print final newline after progress bar
         if verbose:
@@ -134,6 +220,32 @@ class XMLConverter:
             print(f"\nConversion complete!")
             print(f"Total time: {total_time:.1f} seconds")
             print(f"Average time per file: {total_time/(total_files + 1):.1f} seconds")
+    
+    
+    def _print_progress(self, i: int, total_files: int, start_time: float):
+        """Print a progress bar with elapsed time and ETA, overwriting the current line."""
+        current_time = time.time()
+        elapsed_time = current_time - start_time
+        
+        # Calculate progress metrics
+        progress = i / total_files
+        if progress > 0:
+            eta = elapsed_time / progress - elapsed_time
+            eta_str = f"{int(eta // 60)}m {int(eta % 60)}s"
+        else:
+            eta_str = "calculating..."
+        
+        # Format elapsed time string
+        elapsed_str = f"{int(elapsed_time // 60)}m {int(elapsed_time % 60)}s"
+        
+        # Create progress bar
+        bar_length = 30
+        arrow = '=' * int(round(progress * bar_length) - 1) + '>'
+        spaces = ' ' * (bar_length - len(arrow))
+        progress_text = f"\r[{arrow}{spaces}] {i}/{total_files} ({progress:.1%}) | Time: {elapsed_str} | ETA: {eta_str}"
+        
+        # Print progress bar (overwrite same line)
+        print(progress_text, end='', flush=True)
             
 
 
@@ -1,110 +1,250 @@
 # A class to convert a pubmed central (PMC) xml document to txt format
 #
 
-import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional
+from lxml import etree as ET
+from functools import cached_property
+from itertools import starmap
+from typing import Dict, Iterable, Iterator, List, Optional
+import orjson
 import re
 
+
+# Runs of whitespace, collapsed to a single space in extracted text. For str patterns
+# \s is Unicode-aware, so no-break spaces (&nbsp;) and other hard spaces are included
+#
+_WS_RE = re.compile(r"\s+")
+
+
+# Reusable parser for PMC articles. Comments and processing instructions are dropped at
+# parse time and no @id hash table is built, as nothing downstream uses them.
+# Blank text is kept: dropping it would remove spaces between inline elements.
+#
+_XML_PARSER = ET.XMLParser(remove_comments=True, remove_pis=True, collect_ids=False, huge_tree=False)
+
+
+# Headers of the text output with their underlines, built once
+#
+_HDR_PMC_ID     = ("PMC ID", "=" * 6)
+_HDR_TITLE      = ("TITLE", "=" * 5)
+_HDR_JOURNAL    = ("JOURNAL", "=" * 7)
+_HDR_PUB_DATE   = ("PUBLICATION DATE", "=" * 15)
+_HDR_AUTHORS    = ("AUTHORS", "=" * 7)
+_HDR_ABSTRACT   = ("ABSTRACT", "=" * 8)
+_HDR_BODY       = ("BODY", "=" * 4)
+_HDR_REFERENCES = ("\nREFERENCES", "=" * 10)
+
+
+# One line of the references section from an (index, pmid, authors, title, journal, year) tuple
+#
+_format_reference = "[{}] {}. {}. {}. {} ({})".format
+
+
+# Output files are written in a single call through a buffer large enough for a whole paper
+#
+_WRITE_BUFFER_SIZE = 1 << 17
+
+
+def _write_bytes(filename: str, data: bytes) -> None:
+    """Write encoded output to a file with one buffered write."""
+    with open(filename, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+        f.write(data)
+
+
+def _write_chunks(filename: str, chunks: Iterable[str]) -> None:
+    """Stream text chunks to a file as UTF-8 through the write buffer."""
+    with open(filename, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+        f.writelines(chunk.encode("utf-8") for chunk in chunks)
+
+
+# Document-level elements collected by XmlToDoc in a single pass over the tree
+#
+_INDEXED_TAGS = ("journal-title", "pub-date", "article-id", "article-title", "author-notes",
+                 "contrib", "aff", "abstract", "body", "ref-list")
+
+
+# Compiled XPath expressions for lookups inside a subtree (contrib, ref, ...)
+#
+_X_AFF_XREF      = ET.XPath(".//xref[@ref-type='aff']")
+_X_CORRESP_XREF  = ET.XPath(".//xref[@ref-type='corresp']")
+_X_NAME          = ET.XPath("(.//name)[1]")
+_X_EMAIL         = ET.XPath("(.//email)[1]")
+_X_ORCID         = ET.XPath("(.//contrib-id[@contrib-id-type='orcid'])[1]")
+_X_PARAGRAPHS    = ET.XPath(".//p")
+_X_CITATION      = ET.XPath("(.//element-citation)[1]")
+_X_MIXED         = ET.XPath("(.//mixed-citation)[1]")
+_X_PMID          = ET.XPath("(.//pub-id[@pub-id-type='pmid'])[1]")
+_X_PERSON_GROUP  = ET.XPath("(.//person-group)[1]")
+_X_NAMES         = ET.XPath(".//name")
+
+
+def _first(xpath: ET.XPath, elem: ET._Element, **variables) -> Optional[ET._Element]:
+    """Return the first node matched by a compiled XPath, or None."""
+    result = xpath(elem, **variables)
+    return result[0] if result else None
+
+
+def _format_pub_date(pub_date: ET._Element) -> str:
+    """Join the first year, month and day children of a pub-date element as YYYY-MM-DD."""
+    # Collect the first year, month and day children in one pass
+    date_parts = {}
+    for child in pub_date:
+        date_parts.setdefault(child.tag, child.text)
+    
+    return "-".join(date_parts[key] for key in ("year", "month", "day") if key in date_parts)
+
+
 class XmlToDoc:
     """A class to convert PubMed Central XML documents to text."""
     
+    # Method rendering each (format, doc_type) combination
+    _RENDERERS = {
+        ("txt", "paper"):                   "paper_to_text",
+        ("txt", "paper_with_metadata"):     "paper_to_text_with_metadata",
+        ("txt", "paper_without_metadata"):  "paper_to_text_without_metadata",
+        ("txt", "author"):                  "authors_to_text",
+        ("txt", "references"):              "references_to_text",
+        ("json", "paper"):                  "paper_to_json",
+        ("json", "paper_with_metadata"):    "paper_to_json_with_metadata",
+        ("json", "paper_without_metadata"): "paper_to_json_without_metadata",
+        ("json", "author"):                 "authors_to_json",
+        ("json", "references"):             "references_to_json",
+    }
+    
+    # Paper text doc types streamed to file, as (include_authors, include_references)
+    _STREAMED_TEXT = {
+        "paper":                  (True, True),
+        "paper_with_metadata":    (True, True),
+        "paper_without_metadata": (False, False),
+    }
+    
     def __init__(self, xml_path: str):
         """Initialize with path to XML file."""
-        self.tree = ET.parse(xml_path)
+        self.tree = ET.parse(xml_path, parser=_XML_PARSER)
         self.root = self.tree.getroot()
+        self._elements = self._index_elements()
+    
+    def _index_elements(self) -> Dict[str, List[ET._Element]]:
+        """Collect the document-level elements used by the getters in one traversal."""
+        elements = {tag: [] for tag in _INDEXED_TAGS}
+        for elem in self.root.iter(*_INDEXED_TAGS):
+            elements[elem.tag].append(elem)
+        return elements
+    
+    def _first_element(self, tag: str) -> Optional[ET._Element]:
+        """Return the first element with the given tag in document order, or None."""
+        elements = self._elements[tag]
+        return elements[0] if elements else None
         
-    def _get_text_from_element(self, elem: Optional[ET.Element]) -> str:
+    def _get_text_from_element(self, elem: Optional[ET._Element]) -> str:
         """Extract text from an element, preserving whitespace."""
         if elem is None:
             return ""
         
-        # Convert element to string with proper spacing
-        text = "".join(elem.itertext()).strip()
-        
-        # Clean up extra whitespace while preserving single spaces
-        text = " ".join(text.split())
-        
-        return text
+        # Join the text of all descendants and collapse runs of whitespace to single spaces
+        return _WS_RE.sub(" ", "".join(elem.itertext())).strip()
     
     
     
     # journal, publication date, pmc id
     #
-    def get_journal_name(self) -> str:
+    @cached_property
+    def journal_name(self) -> str:
         """Extract journal name."""
-        journal_elem = self.root.find(".//journal-title")
+        journal_elem = self._first_element("journal-title")
         return journal_elem.text if journal_elem is not None else ""
 
-    def get_publication_date(self) -> str:
+    def get_journal_name(self) -> str:
+        """Return the cached journal name."""
+        return self.journal_name
+
+    @cached_property
+    def publication_date(self) -> str:
         """Extract publication date."""
-        pub_date = self.root.find(".//pub-date")
-        if pub_date is not None:
-            year = pub_date.find("year")
-            month = pub_date.find("month")
-            day = pub_date.find("day")
-            
-            date_parts = []
-            if year is not None:
-                date_parts.append(year.text)
-            if month is not None:
-                date_parts.append(month.text)
-            if day is not None:
-                date_parts.append(day.text)
-            
-            return "-".join(date_parts)
+        pub_date = self._first_element("pub-date")
+        return _format_pub_date(pub_date) if pub_date is not None else ""
+
+    def get_publication_date(self) -> str:
+        """Return the cached publication date."""
+        return self.publication_date
+
+    @staticmethod
+    def read_publication_date(xml_path: str) -> str:
+        """
+        Read only the publication date of an XML file, without building the document tree.
+        The parse stops at the first pub-date, so the result matches get_publication_date().
+        """
+        with open(xml_path, "rb") as f:
+            for _, pub_date in ET.iterparse(f, events=("end",), tag="pub-date", remove_comments=True, remove_pis=True):
+                return _format_pub_date(pub_date)
         return ""
 
-    def get_pmc_id(self) -> str:
+    @cached_property
+    def pmc_id(self) -> str:
         """Extract PMC ID."""
-        pmc_elem = self.root.find(".//article-id[@pub-id-type='pmc']")
+        pmc_elem = next((elem for elem in self._elements["article-id"] 
+                         if elem.get("pub-id-type") == "pmc"), None)
         return pmc_elem.text if pmc_elem is not None else ""
+
+    def get_pmc_id(self) -> str:
+        """Return the cached PMC ID."""
+        return self.pmc_id
     
     
     
     # author info
     #
-    def get_author_info(self) -> List[Dict]:
+    @cached_property
+    def _aff_text_by_id(self) -> Dict[str, str]:
+        """Affiliation text keyed by the aff @id (first occurrence wins), extracted once per affiliation."""
+        aff_text_by_id = {}
+        for aff in self._elements["aff"]:
+            aff_id = aff.get("id")
+            if aff_id not in aff_text_by_id:
+                aff_text_by_id[aff_id] = self._get_text_from_element(aff)
+        return aff_text_by_id
+    
+    @cached_property
+    def _corresp_info(self) -> Dict[str, str]:
+        """Corresponding author emails from author-notes, keyed by corresp @id (e.g., CR1)."""
+        corresp_info = {}
+        for author_notes in self._elements["author-notes"]:
+            for corresp in author_notes.iterchildren("corresp"):
+                corresp_id = corresp.get('id')
+                email_elem = _first(_X_EMAIL, corresp)
+                if corresp_id is not None and email_elem is not None:
+                    corresp_info[corresp_id] = email_elem.text
+        return corresp_info
+    
+    @cached_property
+    def author_info(self) -> List[Dict]:
         """
         Extract author information including names, affiliations, and email addresses.
         Returns a list of dictionaries containing author details.
         """
         authors = []
-        
-        # First get all corresponding author info from author-notes
-        corresp_info = {}
-        for corresp in self.root.findall(".//author-notes/corresp"):
-            # Get the ID (e.g., CR1) and email
-            corresp_id = corresp.get('id')
-            email_elem = corresp.find(".//email")
-            if corresp_id is not None and email_elem is not None:
-                corresp_info[corresp_id] = email_elem.text
+        aff_text_by_id = self._aff_text_by_id
+        corresp_info = self._corresp_info
         
         # Find all author contributions
-        for contrib in self.root.findall(".//contrib[@contrib-type='author']"):
+        for contrib in self._elements["contrib"]:
+            if contrib.get("contrib-type") != "author":
+                continue
             author_info = {}
             
             # Get name
-            name_elem = contrib.find(".//name")
+            name_elem = _first(_X_NAME, contrib)
             if name_elem is not None:
                 surname = name_elem.find("surname")
                 given_names = name_elem.find("given-names")
                 author_info["name"] = f"{given_names.text if given_names is not None else ''} {surname.text if surname is not None else ''}".strip()
             
-            # Get affiliations
-            affiliation_refs = contrib.findall(".//xref[@ref-type='aff']")
-            affiliations = []
-            for aff_ref in affiliation_refs:
-                aff_id = aff_ref.get("rid")
-                if aff_id:
-                    # Find corresponding affiliation
-                    aff_elem = self.root.find(f".//aff[@id='{aff_id}']")
-                    if aff_elem is not None:
-                        aff_text = self._get_text_from_element(aff_elem)
-                        affiliations.append(aff_text)
-            author_info["affiliations"] = affiliations
+            # Get affiliations, joined against the affiliation texts extracted once above
+            aff_ids = [aff_ref.get("rid") for aff_ref in _X_AFF_XREF(contrib)]
+            author_info["affiliations"] = [aff_text_by_id[aff_id] for aff_id in aff_ids
+                                           if aff_id and aff_id in aff_text_by_id]
             
             # Check for corresponding author references
-            for xref in contrib.findall(".//xref[@ref-type='corresp']"):
+            for xref in _X_CORRESP_XREF(contrib):
                 ref_id = xref.get('rid')
                 if ref_id in corresp_info:
                     author_info["email"] = corresp_info[ref_id]
@@ -112,12 +252,12 @@ class XmlToDoc:
                     break
             else:
                 # If not a corresponding author, check for direct email
-                email_elem = contrib.find(".//email")
+                email_elem = _first(_X_EMAIL, contrib)
                 author_info["email"] = email_elem.text if email_elem is not None else None
                 author_info["is_corresponding"] = False
             
             # Get ORCID if available
-            orcid_elem = contrib.find(".//contrib-id[@contrib-id-type='orcid']")
+            orcid_elem = _first(_X_ORCID, contrib)
             if orcid_elem is not None:
                 author_info["orcid"] = orcid_elem.text
                 
@@ -125,9 +265,13 @@ class XmlToDoc:
         
         return authors
     
+    def get_author_info(self) -> List[Dict]:
+        """Return the cached author information."""
+        return self.author_info
+    
     def get_authors(self) -> str:
         """Get author information as readable text."""
-        authors = self.get_author_info()
+        authors = self.author_info
         
         text_parts = []
         
@@ -159,29 +303,29 @@ class XmlToDoc:
         parts = []
         
         # Get PMC ID
-        pmc_id = self.get_pmc_id()
+        pmc_id = self.pmc_id
         if pmc_id:
-            parts.extend(["PMC ID", "=" * 6, f"PMC{pmc_id}", "\n"])
+            parts.extend((*_HDR_PMC_ID, f"PMC{pmc_id}", "\n"))
         
         # Get title
-        title = self.get_title()
+        title = self.title
         if title:
-            parts.extend(["TITLE", "=" * 5, title, "\n"])
+            parts.extend((*_HDR_TITLE, title, "\n"))
         
         # Get journal name
-        journal = self.get_journal_name()
+        journal = self.journal_name
         if journal:
-            parts.extend(["JOURNAL", "=" * 7, journal, "\n"])
+            parts.extend((*_HDR_JOURNAL, journal, "\n"))
         
         # Get publication date
-        pub_date = self.get_publication_date()
+        pub_date = self.publication_date
         if pub_date:
-            parts.extend(["PUBLICATION DATE", "=" * 15, pub_date, "\n"])
+            parts.extend((*_HDR_PUB_DATE, pub_date, "\n"))
         
         # Get author information
         authors = self.get_authors()
         if authors:
-            parts.extend(["AUTHORS", "=" * 7, authors, "\n"])
+            parts.extend((*_HDR_AUTHORS, authors, "\n"))
         
         return "\n".join(parts)
     
@@ -189,40 +333,61 @@ class XmlToDoc:
     
     # main paper info
     #    
-    def get_title(self) -> str:
+    @cached_property
+    def title(self) -> str:
         """Extract article title."""
-        title_elem = self.root.find(".//article-title")
+        title_elem = self._first_element("article-title")
         return title_elem.text if title_elem is not None else ""
     
-    def get_abstract(self) -> str:
+    def get_title(self) -> str:
+        """Return the cached article title."""
+        return self.title
+    
+    @cached_property
+    def abstract(self) -> str:
         """Extract abstract text."""
         abstract_parts = []
-        for abstract in self.root.findall(".//abstract"):
-            for p in abstract.findall(".//p"):
+        for abstract in self._elements["abstract"]:
+            for p in _X_PARAGRAPHS(abstract):
                 abstract_parts.append(self._get_text_from_element(p))
         return "\n".join(abstract_parts)
     
-    def get_body(self) -> Dict[str, str]:
+    def get_abstract(self) -> str:
+        """Return the cached abstract text."""
+        return self.abstract
+    
+    @cached_property
+    def body(self) -> Dict[str, str]:
         """Extract body text organized by sections."""
         sections = {}
         
         # Find all sections in the body
-        body = self.root.find(".//body")
+        body = self._first_element("body")
         if body is None:
             return sections
             
-        for sec in body.findall(".//sec"):
+        # One pass over the body: sections in document order, and the direct
+        # paragraphs of each section (not those in nested tables or sub-sections)
+        secs = []
+        paragraphs_by_sec = {}
+        for elem in body.iter("sec", "p"):
+            if elem.tag == "sec":
+                paragraphs = []
+                secs.append((elem, paragraphs))
+                paragraphs_by_sec[elem] = paragraphs
+                continue
+            
+            paragraphs = paragraphs_by_sec.get(elem.getparent())
+            if paragraphs is not None:
+                text = self._get_text_from_element(elem)
+                if text:
+                    paragraphs.append(text)
+        
+        for sec, paragraphs in secs:
             # Get section title
             title = sec.find("title")
             section_title = self._get_text_from_element(title) if title is not None else "Untitled Section"
             
-            # Get all paragraphs in this section, excluding those in nested tables
-            paragraphs = []
-            for p in sec.findall("p"):  # Direct paragraphs only, not those in tables
-                text = self._get_text_from_element(p)
-                if text.strip():
-                    paragraphs.append(text.strip())
-            
             # Only add sections with content
             if paragraphs:
                 if section_title in sections:
@@ -232,37 +397,53 @@ class XmlToDoc:
                     sections[section_title] = "\n".join(paragraphs)
         
         return sections
+    
+    def get_body(self) -> Dict[str, str]:
+        """Return the cached body sections."""
+        return self.body
 
 
 
     # references
     #
-    def get_references(self) -> List[tuple]:
+    @cached_property
+    def references(self) -> List[tuple]:
         """
         Extract references with their components.
         Returns list of tuples: (index, pmid, authors, title, journal, year)
         """
         references = []
-        ref_list = self.root.find(".//ref-list")
+        ref_list = self._first_element("ref-list")
         
         if ref_list is None:
             return references
             
         for index, ref in enumerate(ref_list.findall("ref")):
   
-            # Get citation
-            citation = ref.find(".//element-citation") or ref.find(".//mixed-citation")
+            # Get citation: the element-citation, or the mixed-citation if it has no children
+            citation = _first(_X_CITATION, ref)
+            if citation is None or len(citation) == 0:
+                citation = _first(_X_MIXED, ref)
             
             if citation is not None:
+                # Collect the citation's children in one pass: the first child of each tag, 
+                # and all <name> children for citations without a person-group
+                children = {}
+                names = []
+                for child in citation:
+                    if child.tag == "name":
+                        names.append(child)
+                    children.setdefault(child.tag, child)
+                
                 # Get PMID if available
-                pmid_elem = citation.find(".//pub-id[@pub-id-type='pmid']")
+                pmid_elem = _first(_X_PMID, citation)
                 pmid = pmid_elem.text if pmid_elem is not None else "N/A"
                 
                 # Get authors
                 authors = []
-                person_group = citation.find(".//person-group")
+                person_group = _first(_X_PERSON_GROUP, citation)
                 if person_group is not None:
-                    for name in person_group.findall(".//name"):
+                    for name in _X_NAMES(person_group):
                         surname = name.find("surname")
                         given_names = name.find("given-names")
                         if surname is not None and given_names is not None:
@@ -270,27 +451,27 @@ class XmlToDoc:
                     if person_group.find("etal") is not None:
                         authors.append("et al")
                 else:
-                    for name in citation.findall("name"):
+                    for name in names:
                         surname = name.find("surname")
                         given_names = name.find("given-names")
                         if surname is not None and given_names is not None:
                             authors.append(f"{surname.text} {given_names.text}")
                     # Check for et al
-                    if citation.find("etal") is not None:
+                    if "etal" in children:
                         authors.append("et al.")
                 author_text = ", ".join(authors)
                     
                 
                 # Get title
-                title_elem = citation.find("article-title")
+                title_elem = children.get("article-title")
                 title = self._get_text_from_element(title_elem) if title_elem is not None else ""
             
                 # Get journal/source
-                source_elem = citation.find("source")
+                source_elem = children.get("source")
                 journal = source_elem.text if source_elem is not None else ""
                 
                 # Get year
-                year_elem = citation.find("year")
+                year_elem = children.get("year")
                 year = year_elem.text if year_elem is not None else ""
                 
                 
@@ -298,15 +479,18 @@ class XmlToDoc:
         
         return references
     
+    def get_references(self) -> List[tuple]:
+        """Return the cached references."""
+        return self.references
+    
     def references_to_text(self) -> str:
         """Get references as readable text."""
         parts = []
         
-        references = self.get_references()
+        references = self.references
         if references:
-            parts.extend(["\nREFERENCES", "=" * 10])
-            for index, pmid, authors, title, journal, year in references:
-                parts.append(f"[{index}] {pmid}. {authors}. {title}. {journal} ({year})")
+            parts.extend(_HDR_REFERENCES)
+            parts.extend(starmap(_format_reference, references))
         
         return "\n".join(parts)
     
@@ -314,39 +498,52 @@ class XmlToDoc:
 
     # Text conversion for: entire paper, paper with metadata, paper without metadata, authors, references
     #
-    def paper_to_text(self, include_authors: bool = True, include_references: bool = True) -> str:
-        """Convert entire article to text format."""
-        parts = []
-        
+    def _iter_paper_parts(self, include_authors: bool = True, include_references: bool = True) -> Iterator[str]:
+        """Yield the headers and contents of the article text, one part per line or block."""
         # Title
-        title = self.get_title()
+        title = self.title
         if title:
-            parts.extend(["TITLE", "=" * 5, title, "\n"])
+            yield from (*_HDR_TITLE, title, "\n")
         
         # Authors
-        authors = self.get_authors()
-        if include_authors and authors:
-            parts.extend(["AUTHORS", "=" * 7, authors, "\n"])
+        if include_authors:
+            authors = self.get_authors()
+            if authors:
+                yield from (*_HDR_AUTHORS, authors, "\n")
         
         # Abstract
-        abstract = self.get_abstract()
+        abstract = self.abstract
         if abstract:
-            parts.extend(["ABSTRACT", "=" * 8, abstract, "\n"])
+            yield from (*_HDR_ABSTRACT, abstract, "\n")
         
         # Body
-        parts.extend(["BODY", "=" * 4])
-        for section_title, content in self.get_body().items():
-            parts.extend([f"\n{section_title}", "-" * len(section_title), content])
+        yield from _HDR_BODY
+        for section_title, content in self.body.items():
+            yield from (f"\n{section_title}", "-" * len(section_title), content)
         
         # References
-        references = self.get_references()
-        if include_references and references:
-            parts.extend(["\nREFERENCES", "=" * 10])
-            for index, pmid, authors, title, journal, year in references:
-                parts.append(f"[{index}] {pmid}. {authors}. {title}. {journal} ({year})")
+        if include_references:
+            references = self.references
+            if references:
+                yield from _HDR_REFERENCES
+                yield from starmap(_format_reference, references)
     
-        
-        return "\n".join(parts)
+    def iter_paper_text(self, include_authors: bool = True, include_references: bool = True) -> Iterator[str]:
+        """
+        Convert entire article to text format, yielding the text in chunks.
+        Joining the chunks gives the same text as paper_to_text.
+        """
+        parts = self._iter_paper_parts(include_authors, include_references)
+        for part in parts:
+            yield part
+            break
+        for part in parts:
+            yield "\n"
+            yield part
+    
+    def paper_to_text(self, include_authors: bool = True, include_references: bool = True) -> str:
+        """Convert entire article to text format."""
+        return "".join(self.iter_paper_text(include_authors, include_references))
     
     def paper_to_text_with_metadata(self) -> str:
         """Convert entire article to text format with metadata."""
@@ -365,27 +562,27 @@ class XmlToDoc:
         paper_data = {}
         
         # Add title
-        paper_data["title"] = self.get_title()
+        paper_data["title"] = self.title
         
         # Add journal info
-        paper_data["journal"] = self.get_journal_name()
-        paper_data["publication_date"] = self.get_publication_date()
-        paper_data["pmc_id"] = self.get_pmc_id()
+        paper_data["journal"] = self.journal_name
+        paper_data["publication_date"] = self.publication_date
+        paper_data["pmc_id"] = self.pmc_id
         
         # Add authors if requested
         if include_authors:
-            paper_data["authors"] = self.get_author_info()
+            paper_data["authors"] = self.author_info
         
         # Add abstract
-        paper_data["abstract"] = self.get_abstract()
+        paper_data["abstract"] = self.abstract
         
         # Add body
-        paper_data["body"] = self.get_body()
+        paper_data["body"] = self.body
         
         # Add references if requested
         if include_references:
             reference_data = []
-            for index, pmid, authors, title, journal, year in self.get_references():
+            for index, pmid, authors, title, journal, year in self.references:
                 reference_data.append({
                     "index": index,
                     "pmid": pmid,
@@ -409,18 +606,18 @@ class XmlToDoc:
     def authors_to_json(self) -> dict:
         """Convert author information to JSON format."""
         authors_data = {
-            "pmc_id": self.get_pmc_id(),
-            "title": self.get_title(),
-            "journal": self.get_journal_name(),
-            "publication_date": self.get_publication_date(),
-            "authors": self.get_author_info()
+            "pmc_id": self.pmc_id,
+            "title": self.title,
+            "journal": self.journal_name,
+            "publication_date": self.publication_date,
+            "authors": self.author_info
         }
         return authors_data
     
     def references_to_json(self) -> dict:
         """Get references as JSON."""
         reference_data = []
-        for index, pmid, authors, title, journal, year in self.get_references():
+        for index, pmid, authors, title, journal, year in self.references:
             reference_data.append({
                 "index": index,
                 "pmid": pmid,
@@ -433,27 +630,33 @@ class XmlToDoc:
     
     def save_to_json_file(self, filename: str, doc_type: str = "paper") -> None:
         """Save the article to a JSON file."""
-        import json
-        
-        data = None
-        if doc_type == "paper":
-            data = self.paper_to_json()
-        elif doc_type == "paper_with_metadata":
-            data = self.paper_to_json_with_metadata()
-        elif doc_type == "paper_without_metadata":
-            data = self.paper_to_json_without_metadata()
-        elif doc_type == "author":
-            data = self.authors_to_json()
-        elif doc_type == "references":
-            data = self.references_to_json()
-        
-        if data:
-            with open(filename, "w", encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        self.save_to_file(filename, doc_type=doc_type, format="json")
     
     
-    # Main function to save to file
+    # Main functions to render and save to file
     #
+    def to_bytes(self, doc_type: str = "paper", format: str = "txt") -> Optional[bytes]:
+        """
+        Render the article as UTF-8 encoded file contents.
+        
+        Args:
+            doc_type: Type of document to render (paper, paper_with_metadata, paper_without_metadata, author, references)
+            format: File format to render as (txt or json)
+        
+        Returns:
+            The encoded contents, or None if the doc_type/format combination is unknown
+        """
+        renderer = self._RENDERERS.get((format, doc_type))
+        if renderer is None:
+            return None
+        
+        data = getattr(self, renderer)()
+        if format == "txt":
+            return data.encode("utf-8")
+        if data:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        return None
+    
     def save_to_file(self, filename: str, doc_type: str = "paper", format: str = "txt") -> None:
         """
         Save the article to a file.
@@ -463,24 +666,15 @@ class XmlToDoc:
             doc_type: Type of document to save (paper, paper_with_metadata, paper_without_metadata, author, references)
             format: File format to save as (txt or json)
         """   
-        if format == "txt":
-            if doc_type == "paper":
-                with open(filename, "w", encoding='utf-8') as f:
-                    f.write(self.paper_to_text())
-            elif doc_type == "paper_with_metadata":
-                with open(filename, "w", encoding='utf-8') as f:
-                    f.write(self.paper_to_text_with_metadata())
-            elif doc_type == "paper_without_metadata":
-                with open(filename, "w", encoding='utf-8') as f:
-                    f.write(self.paper_to_text_without_metadata())
-            elif doc_type == "author":
-                with open(filename, "w", encoding='utf-8') as f:
-                    f.write(self.authors_to_text())
-            elif doc_type == "references":
-                with open(filename, "w", encoding='utf-8') as f:
-                    f.write(self.references_to_text())
-        elif format == "json":
-            self.save_to_json_file(filename, doc_type)
+        if format == "txt" and doc_type in self._STREAMED_TEXT:
+            # Stream the paper text to the file instead of building the whole string first
+            include_authors, include_references = self._STREAMED_TEXT[doc_type]
+            _write_chunks(filename, self.iter_paper_text(include_authors, include_references))
+            return
+        
+        data = self.to_bytes(doc_type=doc_type, format=format)
+        if data is not None:
+            _write_bytes(filename, data)
     
         
 
@@ -2,16 +2,36 @@
 Class to use Entrez API to search and get data from PubMed / PMC etc.
 '''
 
+from contextlib import contextmanager
 from math import inf
 import re
+import orjson
 import requests
-import xml.etree.ElementTree as ET
-import os, time, hashlib
+import urllib3
+from requests.adapters import HTTPAdapter
+from lxml import etree as ET
+import os, sys, time, hashlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from papers.functions import Functions
-from typing import List, Tuple, Dict, Union
+from papers.throttle import ConcurrencyController, RateLimiter
+from typing import List, Tuple, Dict, Union, Set
+
+
+# Records of an efetch XML response, with the IDs each record can be matched on
+_RECORD_ID_XPATHS = {
+    "article":           ET.XPath("front/article-meta/article-id[@pub-id-type='pmc' or @pub-id-type='pmcid']/text()"),
+    "PubmedArticle":     ET.XPath("MedlineCitation/PMID/text()"),
+    "PubmedBookArticle": ET.XPath("BookDocument/PMID/text()"),
+}
+
+
+def _normalize_id(id: str) -> str:
+    """Normalize a PMC/PubMed ID for matching, e.g. 'PMC123' and '123' both give '123'."""
+    return id.strip().upper().removeprefix("PMC")
+
 
 class Entrez:
-    def __init__(self, config_file: str = None, base_data_dir: str = None):
+    def __init__(self, config_file: str = None, base_data_dir: str = None, timeout: float = 30):
         self.base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
         self.base_data_dir = base_data_dir
         self.api_key = None
@@ -20,26 +40,311 @@ class Entrez:
                 line = f.readline().strip()
                 self.api_key = line.split('=')[1]
         
+        # NCBI allows 10 requests per second with an api_key and 3 without.
+        # The window is slightly more than 1 second to be safe
+        self.rate_limiter = RateLimiter(limit=10 if self.api_key else 3, period=1.1)
+        
+        # Number of requests in flight, adapted to the server's latency and overload responses
+        self.concurrency = ConcurrencyController()
+        
+        # One session for all requests, so connections (and their TLS handshakes) are reused.
+        # The pool holds a connection for every request the controller can have in flight
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency.maximum)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
         self.search_term            = None
         self.sanitized_search_term  = None
         self.search_results_file    = None
         self.ids                    = None
         
+    
+    def close(self):
+        """
+        Close the connections of the HTTP session.
+        """
+        self.session.close()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
-    def entrez(self, util, db="pmc", **kwargs):
+        
+    @contextmanager
+    def _stream(self, util, db="pmc", method="GET", records=1, **kwargs):
         """
-        Use Entrez API to search and get data from PubMed / PMC etc.
+        Send a request to the Entrez API and yield the response before its body is downloaded,
+        so it can be read in chunks. With method="POST" the parameters are sent in the request
+        body, for ID lists too long for a URL.
+        
+        The request holds its concurrency slot until the body has been read and the response
+        is closed, so downloads count towards the limit and the latency includes the transfer.
+        records is the number of records asked for, to compare latencies of different sizes.
+        Only HTTP and network errors adjust the limit: errors raised while handling the body
+        (e.g. an XML syntax error or a full disk) give the slot back and propagate unchanged.
         """
         params = {
             "db": db,
             "api_key": self.api_key,
             **kwargs
         }
-        response = requests.get(f"{self.base_url}{util}.fcgi", params=params)
-        response.raise_for_status()
-        return response.text
+        self.concurrency.acquire()
+        self.rate_limiter.acquire()
+        start = time.monotonic()
+        status_code = None
+        response = None
+        adjust = True
+        try:
+            url = f"{self.base_url}{util}.fcgi"
+            if method == "POST":
+                response = self.session.post(url, data=params, stream=True, timeout=self.timeout)
+            else:
+                response = self.session.get(url, params=params, stream=True, timeout=self.timeout)
+            status_code = response.status_code
+            self.rate_limiter.update(response)
+            response.raise_for_status()
+            yield response
+        except requests.HTTPError:
+            raise
+        except (requests.RequestException, urllib3.exceptions.HTTPError):
+            # The connection or the transfer of the body failed
+            status_code = None
+            raise
+        except Exception:
+            # Not the server's fault, so its load is not judged from this request
+            adjust = False
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            self.concurrency.release(time.monotonic() - start, status_code, key=util, size=records, adjust=adjust)
+    
+    
+    def _request(self, util, db="pmc", method="GET", **kwargs):
+        """
+        Send a request to the Entrez API and return the response, with its body already downloaded.
+        """
+        with self._stream(util, db=db, method=method, **kwargs) as response:
+            response.content  # Download the body while the request holds its slot
+        return response
+    
+    
+    def entrez(self, util, db="pmc", **kwargs):
+        """
+        Use Entrez API to search and get data from PubMed / PMC etc.
+        """
+        return self._request(util, db=db, **kwargs).text
+    
+    
+    def _esearch(self, db="pmc", **kwargs):
+        """
+        Run an esearch request and parse its XML while it downloads, clearing each element once read.
+        Returns a dictionary with the IDs under "ids" and the top-level Count, WebEnv and QueryKey when present.
+        """
+        results = {"ids": []}
+        parser = ET.XMLPullParser(events=("end",), tag=("Id", "Count", "WebEnv", "QueryKey"))
+        with self._stream("esearch", db=db, **kwargs) as response:
+            for chunk in response.iter_content(chunk_size=8192):
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    if elem.tag == "Id":
+                        results["ids"].append(elem.text)
+                    elif elem.getparent().getparent() is None:
+                        # Only the Count of the result itself, not those nested in the TranslationStack
+                        results[elem.tag] = elem.text
+                    elem.clear()
+        parser.close()
+        return results
 
 
+    def epost(self, ids, db="pmc"):
+        """
+        Upload a list of IDs to the Entrez history server with one POST request.
+        Returns the (WebEnv, query_key) that refer to them in later requests.
+        """
+        content = self._request("epost", db=db, method="POST", id=",".join(ids)).content
+        root = ET.fromstring(content)
+        web_env, query_key = root.findtext("WebEnv"), root.findtext("QueryKey")
+        if not web_env or not query_key:
+            raise ValueError(f"epost did not return a WebEnv and QueryKey: {content[:200]}")
+        return web_env, query_key
+    
+    
+    def _fetch_one(self, fetch_dir, db, id, retmode, **kwargs):
+        """
+        Fetch a single paper and save it to fetch_dir. Runs in a worker thread of fetch().
+        """
+        # Stream the result to disk without holding the whole document in memory
+        filepath = os.path.join(fetch_dir, f"{db}_{id}.{retmode}")
+        with self._stream("efetch", db=db, id=id, retmode=retmode, **kwargs) as response:
+            self._save_file(filepath, response.iter_content(chunk_size=1 << 16))
+    
+    
+    def _fetch_batch(self, fetch_dir, db, ids, retmode, **kwargs) -> Set[str]:
+        """
+        Fetch a batch of papers with one efetch request and save each paper to its own file in fetch_dir.
+        Runs in a worker thread of fetch(). Returns the set of IDs that were saved.
+        """
+        if retmode != "xml":
+            # Only XML responses can be split back into papers, other formats are fetched one ID per request
+            for id in ids:
+                self._fetch_one(fetch_dir, db, id, retmode, **kwargs)
+            return set(ids)
+        
+        with self._stream("efetch", db=db, records=len(ids), id=",".join(ids), retmode=retmode, **kwargs) as response:
+            response.raw.decode_content = True
+            return self._save_records(response.raw, fetch_dir, db, ids, retmode)
+    
+    
+    def _fetch_posted(self, fetch_dir, db, ids, web_env, query_key, retstart, retmax, retmode, **kwargs) -> Set[str]:
+        """
+        Fetch one page of the IDs uploaded with epost and save each paper to its own file in fetch_dir.
+        The records are matched against ids, all the IDs that were posted. Runs in a worker thread
+        of fetch(). Returns the set of IDs that were saved.
+        """
+        records = max(1, min(retmax, len(ids) - retstart))
+        with self._stream("efetch", db=db, records=records, WebEnv=web_env, query_key=query_key, 
+                          retstart=retstart, retmax=retmax, retmode=retmode, **kwargs) as response:
+            response.raw.decode_content = True
+            return self._save_records(response.raw, fetch_dir, db, ids, retmode)
+    
+    
+    def _submit_fetches(self, executor, fetch_dir, db, ids, retmode, **kwargs):
+        """
+        Submit the requests fetching ids to the executor.
+        
+        XML papers are uploaded with epost in groups of up to 10000 IDs and fetched from the
+        history server in pages of 500, so no ID list is sent in a URL. If epost fails, the
+        group is fetched in batches of 200 IDs sent with efetch instead. Other formats are
+        fetched one ID per request.
+        
+        Returns the list of ID groups, a dictionary from each future to the index of its group,
+        and the set of the groups fetched from the history server. A group has failed IDs only
+        once all of its requests are done.
+        """
+        post_size, page_size = 10000, 500
+        groups, futures, posted_groups = [], {}, set()
+        
+        if retmode != "xml":
+            for id in ids:
+                groups.append([id])
+                futures[executor.submit(self._fetch_batch, fetch_dir, db, [id], retmode, **kwargs)] = len(groups) - 1
+            return groups, futures, posted_groups
+        
+        for group in self.chunk_list(ids, post_size):
+            try:
+                web_env, query_key = self.epost(group, db=db)
+            except Exception as e:
+                print(f"\nWarning: epost failed ({str(e)}), fetching {len(group)} papers by ID instead")
+                self._submit_batches(executor, groups, futures, fetch_dir, db, group, retmode, **kwargs)
+                continue
+            
+            groups.append(group)
+            posted_groups.add(len(groups) - 1)
+            for retstart in range(0, len(group), page_size):
+                future = executor.submit(self._fetch_posted, fetch_dir, db, group, web_env, query_key, 
+                                         retstart, page_size, retmode, **kwargs)
+                futures[future] = len(groups) - 1
+        
+        return groups, futures, posted_groups
+    
+    
+    def _submit_batches(self, executor, groups, futures, fetch_dir, db, ids, retmode, **kwargs):
+        """
+        Submit efetch requests for ids in batches of 200 IDs, each its own group.
+        The groups and futures are added to those of _submit_fetches. Returns the new futures.
+        """
+        batch_size = 200
+        submitted = []
+        for batch in self.chunk_list(ids, batch_size):
+            groups.append(batch)
+            future = executor.submit(self._fetch_batch, fetch_dir, db, batch, retmode, **kwargs)
+            futures[future] = len(groups) - 1
+            submitted.append(future)
+        return submitted
+    
+    
+    def _save_records(self, source, fetch_dir, db, ids, retmode) -> Set[str]:
+        """
+        Split an efetch XML response into its records (PMC or PubMed articles) with iterparse and save
+        each one to its own file, wrapped in the root element like the response for a single ID.
+        Returns the set of IDs that were saved.
+        """
+        requested = {_normalize_id(id): id for id in ids}
+        saved = set()
+        header = footer = None
+        path_prefix, path_suffix = os.path.join(fetch_dir, f"{db}_"), f".{retmode}"
+        
+        context = ET.iterparse(source, events=("end",), tag=tuple(_RECORD_ID_XPATHS))
+        for _, elem in context:
+            root = elem.getparent()
+            if root is None or root.getparent() is not None:
+                continue  # Not a top-level record
+            
+            if header is None:
+                doctype = elem.getroottree().docinfo.doctype
+                header = f'<?xml version="1.0" ?>\n{doctype}\n<{root.tag}>' if doctype else f'<?xml version="1.0" ?>\n<{root.tag}>'
+                header = header.encode("utf-8")
+                footer = f"</{root.tag}>\n".encode("utf-8")
+            
+            id = next((requested[record_id] for record_id in map(_normalize_id, _RECORD_ID_XPATHS[elem.tag](elem)) 
+                       if record_id in requested), None)
+            if id is not None:
+                filepath = f"{path_prefix}{id}{path_suffix}"
+                self._save_file(filepath, (header, ET.tostring(elem, encoding="UTF-8", with_tail=False), footer))
+                saved.add(id)
+            
+            # Free the record and the ones before it
+            elem.clear()
+            while elem.getprevious() is not None:
+                del root[0]
+        del context
+        
+        return saved
+    
+    
+    def _save_file(self, filepath, chunks):
+        """
+        Write chunks of bytes to filepath. They are written to a temporary file first, so an
+        interrupted download is not mistaken for a fetched paper.
+        """
+        partial_filepath = f"{filepath}.part"
+        with open(partial_filepath, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(partial_filepath, filepath)
+    
+    
+    def _print_progress(self, papers_processed, total_to_fetch, start_time, bar_length=30):
+        """
+        Print the fetch progress bar, overwriting the same line.
+        """
+        progress     = papers_processed / total_to_fetch
+        current_time = time.time()
+        elapsed      = current_time - start_time
+        if progress > 0:
+            eta = elapsed / progress - elapsed
+            eta_str = f"{int(eta // 60)}m {int(eta % 60)}s"
+        else:
+            eta_str = "calculating..."
+    
+        # Create the progress text with elapsed time and ETA
+        elapsed_str   = f"{int(elapsed // 60)}m {int(elapsed % 60)}s"
+        arrow         = '=' * int(round(progress * bar_length) - 1) + '>'
+        spaces        = ' ' * (bar_length - len(arrow))
+        progress_text = f"[{arrow}{spaces}] {papers_processed}/{total_to_fetch} ({progress:.1%}) | Time: {elapsed_str} | ETA: {eta_str}"
+        
+        # Print the progress bar (overwrite the same line)
+        sys.stdout.write(f"\r{progress_text}")
+        sys.stdout.flush()
+    
+    
     def chunk_list(self, lst, chunk_size):
         return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
     
@@ -64,6 +369,27 @@ class Entrez:
         return all_ids
     
     
+    def _read_search_meta(self, filepath):
+        """
+        Read the search metadata saved next to the IDs file: total count, WebEnv, QueryKey and the time
+        the count was retrieved. Returns an empty dictionary if there is none or it cannot be read.
+        """
+        try:
+            with open(filepath, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+    
+    
+    def _write_search_meta(self, filepath, total, web_env=None, query_key=None):
+        """
+        Save the total count and history server session of a search, so a resumed search can skip the count request.
+        """
+        meta = {"total": total, "web_env": web_env, "query_key": query_key, "ts": time.time()}
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(meta))
+    
+    
     def _build_search_term(self, search_terms: List[Dict[str, Union[str, List[str]]]] = [], condition: str = "AND", date_range: Tuple[str, str] = None):
         """
         Build a search term from a list of dictionaries with search_term and location.
@@ -81,9 +407,7 @@ class Entrez:
                 if isinstance(locations, str):
                     locations = [locations]  # Convert single string to list
                 
-                location_terms = []
-                for location in locations:
-                    location_terms.append(f"{search_term}[{location.upper()}]")
+                location_terms = [f"{search_term}[{location.upper()}]" for location in locations]
                 
                 # Join multiple locations with OR
                 if len(location_terms) > 1:
@@ -93,10 +417,7 @@ class Entrez:
         
         # Join the formatted terms with the condition
         if len(formatted_terms) > 1:
-            term = f"({formatted_terms[0]}"
-            for i in range(1, len(formatted_terms)):
-                term += f" {condition} {formatted_terms[i]}"
-            term += ")"
+            term = f"({f' {condition} '.join(formatted_terms)})"
         elif len(formatted_terms) == 1:
             term = formatted_terms[0]
         else:
@@ -147,131 +468,147 @@ class Entrez:
         # Create path with sanitized filename
         filepath = os.path.join(search_dir, f"{self.sanitized_search_term}_ids.txt")
         print(f"Search: Filepath = {filepath}") 
+        meta_filepath = os.path.join(search_dir, f"{self.sanitized_search_term}_meta.json")
         
         # Get any existing IDs from the search file
         all_ids = self.get_ids_from_search_file(filepath, restart)
         retstart = len(all_ids)
         print(f"Search: Retstart = {retstart}")
         
-        # Get total count of results
-        count_elem = None
-        total_papers = 0
-        try:
-            initial_search = self.entrez("esearch", db=db, term=term, retstart=0, retmax=1, **kwargs)
-            root = ET.fromstring(initial_search)
-            count_elem = root.find("Count")
-            total_papers = int(count_elem.text) if count_elem is not None else 0
-            print(f"Search: Total papers from NCBI = {total_papers}")
-        except Exception as e:
-            print(f"Error retrieving total count: {str(e)}")
-            return all_ids
-        
-        # Exit if there are no results
-        if total_papers == 0:
-            print("Search: No results found")
-            return all_ids
+        # Metadata of a previous run of the same search. It is trusted for as long as the history server
+        # keeps its WebEnv (8 hours); after that the count is checked again, to find newly published papers
+        meta = {} if restart else self._read_search_meta(meta_filepath)
+        meta_is_fresh = time.time() - meta.get("ts", 0) < 8 * 3600
         
-                # Initialize variables
+        # Exit if every ID of a recent run is already on disk
+        if meta.get("total") and meta_is_fresh and retstart >= meta["total"]:
+            print(f"Search: All {meta['total']} IDs already retrieved")
+            self.ids                 = all_ids
+            self.search_results_file = filepath
+            return self.ids
+        
+        # Initialize variables
         web_env = None
         query_key = None
+        
+        # Reuse the total count and WebEnv of a recent run
+        if meta.get("total") and meta.get("web_env") and meta_is_fresh:
+            total_papers = meta["total"]
+            web_env      = meta["web_env"]
+            query_key    = meta["query_key"]
+            print(f"Search: Total papers from previous search = {total_papers}")
+        else:
+            # Get total count of results
+            count_elem = None
+            total_papers = 0
+            try:
+                initial_search = self._esearch(db=db, term=term, retstart=0, retmax=1, **kwargs)
+                count_elem = initial_search.get("Count")
+                total_papers = int(count_elem) if count_elem is not None else 0
+                print(f"Search: Total papers from NCBI = {total_papers}")
+            except Exception as e:
+                print(f"Error retrieving total count: {str(e)}")
+                return all_ids
+            
+            # Exit if there are no results
+            if total_papers == 0:
+                print("Search: No results found")
+                return all_ids
+            self._write_search_meta(meta_filepath, total_papers)
+        
         chunk_size = 5000
         consecutive_failures = 0
         max_failures = 3
 
-        # Main search loop with proper exit conditions
-        while retstart < total_papers:
-            try:
-                # Calculate effective position for this request
-                effective_position = retstart
+        # Main search loop with proper exit conditions. The IDs file stays open for the whole
+        # loop and each chunk of IDs is written with a single call
+        with open(filepath, "a", buffering=1 << 16) as ids_file:
+            while retstart < total_papers:
+                try:
+                    # Calculate effective position for this request
+                    effective_position = retstart
                 
-                # If we're resuming from a large offset, use direct retrieval instead of skipping
-                if retstart >= 10000:
-                    # Skip the WebEnv approach for large offsets and use direct retrieval
-                    print(f"Direct retrieval at position {retstart}")
-                    search_results = self.entrez("esearch", db=db, term=term, retstart=retstart, 
-                                               retmax=chunk_size, **kwargs)
-                    root = ET.fromstring(search_results)
-                else:
-                    # Use WebEnv approach for smaller offsets
-                    if web_env is None:
-                        print(f"Starting new search session at position {retstart}")
-                        search_results = self.entrez("esearch", db=db, term=term, retstart=retstart, 
-                                                   retmax=chunk_size, usehistory="y", **kwargs)
-                        root = ET.fromstring(search_results)
+                    # If we're resuming from a large offset, use direct retrieval instead of skipping
+                    if retstart >= 10000:
+                        # Skip the WebEnv approach for large offsets and use direct retrieval
+                        print(f"Direct retrieval at position {retstart}")
+                        search_results = self._esearch(db=db, term=term, retstart=retstart, 
+                                                       retmax=chunk_size, **kwargs)
+                    else:
+                        # Use WebEnv approach for smaller offsets
+                        if web_env is None:
+                            print(f"Starting new search session at position {retstart}")
+                            search_results = self._esearch(db=db, term=term, retstart=retstart, 
+                                                           retmax=chunk_size, usehistory="y", **kwargs)
                         
-                        web_env_elem = root.find("WebEnv")
-                        query_key_elem = root.find("QueryKey")
+                            web_env_elem = search_results.get("WebEnv")
+                            query_key_elem = search_results.get("QueryKey")
                         
-                        if web_env_elem is not None and query_key_elem is not None:
-                            web_env = web_env_elem.text
-                            query_key = query_key_elem.text
+                            if web_env_elem is not None and query_key_elem is not None:
+                                web_env = web_env_elem
+                                query_key = query_key_elem
+                                self._write_search_meta(meta_filepath, total_papers, web_env, query_key)
+                            else:
+                                # Fall back to regular search if WebEnv not available
+                                search_results = self._esearch(db=db, term=term, retstart=retstart, 
+                                                               retmax=chunk_size, **kwargs)
                         else:
-                            # Fall back to regular search if WebEnv not available
-                            search_results = self.entrez("esearch", db=db, term=term, retstart=retstart, 
-                                                      retmax=chunk_size, **kwargs)
-                            root = ET.fromstring(search_results)
-                    else:
-                        # Use WebEnv for subsequent requests
-                        search_results = self.entrez("esearch", db=db, term=term, retstart=retstart, 
-                                                   retmax=chunk_size, usehistory="y", 
-                                                   WebEnv=web_env, query_key=query_key, **kwargs)
-                        root = ET.fromstring(search_results)
+                            # Use WebEnv for subsequent requests
+                            search_results = self._esearch(db=db, term=term, retstart=retstart, 
+                                                           retmax=chunk_size, usehistory="y", 
+                                                           WebEnv=web_env, query_key=query_key, **kwargs)
                 
-                # Extract IDs
-                ids = [id.text for id in root.iter("Id")]
+                    # Extract IDs
+                    ids = search_results["ids"]
                 
-                # Check if we got valid results
-                if not ids:
-                    consecutive_failures += 1
-                    print(f"Warning: No IDs retrieved at position {retstart}. Attempt {consecutive_failures}/{max_failures}.")
+                    # Check if we got valid results
+                    if not ids:
+                        consecutive_failures += 1
+                        print(f"Warning: No IDs retrieved at position {retstart}. Attempt {consecutive_failures}/{max_failures}.")
                     
-                    if consecutive_failures >= max_failures:
-                        print(f"Changing strategy after {consecutive_failures} consecutive failures")
-                        web_env = None  # Reset WebEnv to try different approach
+                        if consecutive_failures >= max_failures:
+                            print(f"Changing strategy after {consecutive_failures} consecutive failures")
+                            web_env = None  # Reset WebEnv to try different approach
                         
-                        # If we were using WebEnv and failed, switch to direct retrieval
-                        if retstart < 10000:
-                            print("Switching to direct retrieval strategy")
-                            retstart = effective_position  # Make sure we're at the right position
-                        else:
-                            # If direct retrieval is also failing, try a smaller chunk size
-                            chunk_size = max(100, chunk_size // 2)
-                            print(f"Reducing chunk size to {chunk_size}")
+                            # If we were using WebEnv and failed, switch to direct retrieval
+                            if retstart < 10000:
+                                print("Switching to direct retrieval strategy")
+                                retstart = effective_position  # Make sure we're at the right position
+                            else:
+                                # If direct retrieval is also failing, try a smaller chunk size
+                                chunk_size = max(100, chunk_size // 2)
+                                print(f"Reducing chunk size to {chunk_size}")
                         
-                        consecutive_failures = 0
+                            consecutive_failures = 0
                     
-                    time.sleep(3)  # Wait longer before retrying
-                    continue
+                        time.sleep(3)  # Wait longer before retrying
+                        continue
                 
-                consecutive_failures = 0  # Reset failure counter on success
-                all_ids.extend(ids)
+                    consecutive_failures = 0  # Reset failure counter on success
+                    all_ids.extend(ids)
                 
-                # Write the resulting IDs to a text file
-                with open(filepath, "a") as f:
-                    for id in ids:
-                        f.write(f"{id}\n")
+                    # Write the resulting IDs to the text file, flushed so a restart resumes after them
+                    ids_file.write("\n".join(ids) + "\n")
+                    ids_file.flush()
                 
-                # Update retstart for next iteration and print progress
-                retstart += len(ids)  # Use actual number of IDs retrieved
-                print(f"Search: Retrieved {len(all_ids)}/{total_papers} papers")
+                    # Update retstart for next iteration and print progress
+                    retstart += len(ids)  # Use actual number of IDs retrieved
+                    print(f"Search: Retrieved {len(all_ids)}/{total_papers} papers")
                 
-                # Respect NCBI's rate limits
-                time.sleep(1.1)
-                
-            except Exception as e:
-                print(f"Error during search: {str(e)}")
-                consecutive_failures += 1
+                except Exception as e:
+                    print(f"Error during search: {str(e)}")
+                    consecutive_failures += 1
                 
-                if consecutive_failures >= max_failures:
-                    print("Changing strategy after exception")
-                    web_env = None
-                    consecutive_failures = 0
+                    if consecutive_failures >= max_failures:
+                        print("Changing strategy after exception")
+                        web_env = None
+                        consecutive_failures = 0
                     
-                    # Try with a smaller chunk size
-                    chunk_size = max(100, chunk_size // 2)
-                    print(f"Reducing chunk size to {chunk_size}")
+                        # Try with a smaller chunk size
+                        chunk_size = max(100, chunk_size // 2)
+                        print(f"Reducing chunk size to {chunk_size}")
                 
-                time.sleep(5)  # Simple retry delay
+                    time.sleep(5)  # Simple retry delay
     
         # Store the results
         self.ids                 = all_ids
@@ -281,9 +618,13 @@ class Entrez:
         return self.ids
     
     
-    def fetch(self, fetch_dir = None, ids = [], db="pubmed", retry_failed=False, retmode="xml", **kwargs):
+    def fetch(self, fetch_dir = None, ids = [], db="pubmed", retry_failed=False, retmode="xml", max_workers=None, **kwargs):
         """
         Fetch papers from PubMed/PMC database and save them to the data directory.
+        
+        Papers are fetched concurrently by a pool of max_workers threads (defaults to the most
+        requests the concurrency controller allows in flight). The controller decides how many
+        of them actually run at once, and the rate limiter keeps them within the API rate limit.
         """
         # Get IDs to fetch
         #
@@ -322,17 +663,22 @@ class Entrez:
         
         # Determine which IDs to fetch
         #
-        downloaded_files = set(os.listdir(fetch_dir))
-        downloaded_ids = {file.split('.')[0].replace(f'{db}_', '') for file in downloaded_files if file.endswith(f'.{retmode}')}
+        # One pass over the directory entries, named {db}_{id}.{retmode}
+        prefix, suffix = f"{db}_", f".{retmode}"
+        with os.scandir(fetch_dir) as entries:
+            downloaded_ids = {
+                entry.name[len(prefix):-len(suffix)] for entry in entries 
+                if entry.name.startswith(prefix) and entry.name.endswith(suffix)
+            }
+        # One set lookup per ID: the failed IDs still to download when retrying, otherwise every
+        # ID that was neither downloaded nor failed
         if retry_failed:
-            ids_to_fetch = [id for id in ids if (id in failed_ids and id not in downloaded_ids)]
+            retry_ids = failed_ids - downloaded_ids
+            ids_to_fetch = [id for id in ids if id in retry_ids]
         else:
-            ids_to_fetch = [id for id in ids if id not in downloaded_ids and id not in failed_ids]
+            skip_ids = downloaded_ids | failed_ids
+            ids_to_fetch = [id for id in ids if id not in skip_ids]
             
-        # Process in batches
-        #
-        batch_size = 100
-        batched_ids = self.chunk_list(ids_to_fetch, batch_size)
         start_time = time.time()
         papers_processed = 0
         total_to_fetch = len(ids_to_fetch)
@@ -340,57 +686,73 @@ class Entrez:
 
         # Run the loop
         #
-        bar_length = 30  # Length of the progress bar
         print(f"Fetching {total_to_fetch} papers from {db}...")
-        for batch in batched_ids:
-            for id in batch:
-                try:
-                    fetch_results = self.entrez("efetch", db=db, id=id, retmode=retmode, **kwargs)
+        unflushed_failures = 0
+        last_progress_time = -inf
+        with open(failed_ids_file, "a") as failed_ids_log, \
+             ThreadPoolExecutor(max_workers=max_workers or self.concurrency.maximum) as executor:
+            # Process in groups of IDs, each fetched by one or more requests
+            groups, futures, posted_groups = self._submit_fetches(executor, fetch_dir, db, ids_to_fetch, retmode, **kwargs)
+            pending = [0] * len(groups)
+            for group in futures.values():
+                pending[group] += 1
+            fetched_by_group = [set() for _ in groups]
+            errors_by_group = [0] * len(groups)
+            
+            not_done = set(futures)
+            while not_done:
+                done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = futures[future]
+                    try:
+                        fetched = future.result()
+                    except Exception as e:
+                        fetched = set()
+                        errors_by_group[group] += 1
                     
-                    # Save the result
-                    filepath = os.path.join(fetch_dir, f"{db}_{id}.{retmode}")
-                    with open(filepath, "wb") as f:
-                        f.write(fetch_results.encode())
+                    fetched_by_group[group].update(fetched)
+                    pending[group] -= 1
+                    papers_processed += len(fetched)
                     
-                    # If retrying and successful, remove from failed_ids
-                    if retry_failed and id in failed_ids:
-                        failed_ids.remove(id)
+                    if pending[group] > 0:
+                        continue
                     
-                except Exception as e:
-                    failed_ids.add(id)
-                    continue
-                
-                papers_processed += 1
-                
-                # Update progress bar for each paper
-                if total_to_fetch > 0: 
-                    progress     = papers_processed / total_to_fetch
-                    current_time = time.time()
-                    elapsed      = current_time - start_time
-                    if progress > 0:
-                        eta = elapsed / progress - elapsed
-                        eta_str = f"{int(eta // 60)}m {int(eta % 60)}s"
-                    else:
-                        eta_str = "calculating..."
-                
-                    # Create the progress text with elapsed time and ETA
-                    elapsed_str   = f"{int(elapsed // 60)}m {int(elapsed % 60)}s"
-                    arrow         = '=' * int(round(progress * bar_length) - 1) + '>'
-                    spaces        = ' ' * (bar_length - len(arrow))
-                    progress_text = f"[{arrow}{spaces}] {papers_processed}/{total_to_fetch} ({progress:.1%}) | Time: {elapsed_str} | ETA: {eta_str}"
+                    # If retrying and successful, remove from failed_ids (the log is pruned once at the end)
+                    if retry_failed:
+                        failed_ids.difference_update(fetched_by_group[group])
+                    
+                    # The group is done. If a page of a posted group failed (a timeout or a server error), its
+                    # missing IDs are fetched again in batches by ID, so one bad request does not fail 500 IDs
+                    missing_ids = [id for id in groups[group] if id not in fetched_by_group[group]]
+                    if group in posted_groups and errors_by_group[group] and missing_ids:
+                        retries = self._submit_batches(executor, groups, futures, fetch_dir, db, missing_ids, retmode, **kwargs)
+                        for _ in retries:
+                            pending.append(1)
+                            fetched_by_group.append(set())
+                            errors_by_group.append(0)
+                        not_done.update(retries)
+                        continue
                     
-                    # Print the progress bar (overwrite the same line)
-                    print(f"\r{progress_text}", end='', flush=True)
+                    # Otherwise requested IDs missing from all its responses failed.
+                    # New failures are appended to the failed IDs log, flushed every 100 IDs
+                    new_failed_ids = [id for id in missing_ids if id not in failed_ids]
+                    if new_failed_ids:
+                        failed_ids.update(new_failed_ids)
+                        failed_ids_log.write("".join(f"{failed_id}\n" for failed_id in new_failed_ids))
+                        unflushed_failures += len(new_failed_ids)
+                        if unflushed_failures >= 100:
+                            failed_ids_log.flush()
+                            unflushed_failures = 0
                 
-                # Respect the API rate limit (10 requests per second)
-                if papers_processed % 10 == 0:
-                    time.sleep(1.1)  # Slightly more than 1 second to be safe
-            
-            # Update the failed IDs file after each batch for persistence
-            if failed_ids:
-                with open(failed_ids_file, "w") as f:
-                    for failed_id in failed_ids:
-                        f.write(f"{failed_id}\n")
+                # Update the progress bar at most every 0.2 s, and after the last request
+                now = time.monotonic()
+                if total_to_fetch > 0 and (now - last_progress_time >= 0.2 or not not_done):
+                    self._print_progress(papers_processed, total_to_fetch, start_time)
+                    last_progress_time = now
+        
+        # Rewrite the failed IDs file once, without the IDs that were retried successfully
+        with open(failed_ids_file, "w") as f:
+            f.write("".join(f"{failed_id}\n" for failed_id in sorted(failed_ids)))
         
         # Final newline after progress bar
         print()
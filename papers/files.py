@@ -3,10 +3,119 @@ A class to search for a specific term in a text file and copy the matching files
 Also contains other related functions.
 """
 
+import logging
+import mmap
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 import re
-from typing import List
+from typing import List, Optional, Tuple
+
+
+# Per-file messages go through logging, so they cost nothing unless a handler is configured.
+# Warnings are shown by default, the per-file matches at INFO level
+#
+logger = logging.getLogger(__name__)
+
+
+# Number of threads copying files. Copies are I/O-bound, and shutil.copy2 copies in the
+# kernel (sendfile) on Linux, so many can be in flight at once
+#
+_COPY_WORKERS = 32
+
+
+def _count_matches(path: Path, combined: Optional[re.Pattern], patterns: List[re.Pattern]) -> int:
+    """
+    Count the occurrences of the patterns in a file, or return 0 if none of them match.
+    combined is the alternation of all patterns, or None when they cannot be combined.
+    
+    Bytes patterns scan a read-only memory map of the file, so it is never copied into memory
+    or decoded. str patterns (regexes and non-ASCII search terms) read and decode the file as UTF-8.
+    """
+    if not patterns:
+        return 0
+    
+    with open(path, "rb") as f:
+        # Empty files cannot be memory mapped, and match nothing
+        if f.seek(0, 2) == 0:
+            return 0
+        
+        if isinstance(patterns[0].pattern, bytes):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return _count_in(content, combined, patterns)
+        
+        f.seek(0)
+        return _count_in(f.read().decode("utf-8"), combined, patterns)
+
+
+def _scan(path: Path, combined: Optional[re.Pattern], patterns: List[re.Pattern]) -> Tuple[Path, int, Optional[str]]:
+    """
+    Count the matches in one file. Runs in a worker process of Files.search_and_copy_files.
+    
+    Returns:
+        Tuple of (path, number of matches, error message). The error message is None on success.
+    """
+    try:
+        return path, _count_matches(path, combined, patterns), None
+    except Exception as e:
+        return path, 0, str(e)
+
+
+def _is_plain_ascii(term: str) -> bool:
+    """
+    Return True for an ASCII search term without regex metacharacters. Such a term matches the same
+    text as a bytes pattern over UTF-8 as it does as a str pattern. Spaces and hyphens are escaped
+    by re.escape but are literal outside a character class, so they do not count as metacharacters.
+    """
+    literal = term.replace(" ", "").replace("-", "")
+    return term.isascii() and re.escape(literal) == literal
+
+
+def _combine(search_terms: List[str], patterns: List[re.Pattern], encode) -> Optional[re.Pattern]:
+    """
+    Compile all the search terms into one case-insensitive alternation, to find matching files in one pass.
+    
+    Returns None when the terms cannot be combined without changing their meaning: when a term has groups,
+    whose backreferences would point at the groups of other terms or whose names could clash, or when the
+    alternation does not compile (e.g. inline global flags that are only allowed at the start of a pattern).
+    """
+    if not search_terms or any(pattern.groups for pattern in patterns):
+        return None
+    
+    alternation = "|".join(f"(?:{term})" for term in search_terms)
+    try:
+        return re.compile(encode(alternation), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _link_or_copy(src: Path, dst: str) -> None:
+    """
+    Hard link a file into the dst directory, so no data is copied. Falls back to shutil.copy2
+    when the link fails, e.g. across filesystems or when another destination file already exists.
+    """
+    dst_file = Path(dst) / Path(src).name
+    try:
+        os.link(src, dst_file)
+    except FileExistsError:
+        # Already linked by an earlier run
+        if not os.path.samefile(src, dst_file):
+            shutil.copy2(src, dst_file)
+    except OSError:
+        shutil.copy2(src, dst_file)
+
+
+def _count_in(content, combined: Optional[re.Pattern], patterns: List[re.Pattern]) -> int:
+    """Count the occurrences of the patterns in content, checking first for any match when they are combined."""
+    # Check if any of the terms match, stopping at the first match
+    if combined is not None and combined.search(content) is None:
+        return 0
+    
+    # Count the occurrences of each term, only for the files that matched
+    return sum(len(pattern.findall(content)) for pattern in patterns)
+
 
 class Files:
     def __init__(self, source_dir: str, dest_dir: str, db: str = "pmc"):
@@ -16,15 +125,20 @@ class Files:
 
 
 
-    def search_and_copy_files(self, search_terms: List[str] = [], doc_type: str = "txt"):
+    def search_and_copy_files(self, search_terms: List[str] = [], doc_type: str = "txt", max_workers: int = None, link: bool = False):
         """
         Search through text files for a specific term and copy matching files to destination.
+        Files are scanned in parallel by a pool of worker processes, and matching files are
+        copied by a pool of threads while the scan goes on.
     
         Args:
             source_dir: Directory containing text files to search
             dest_dir: Directory to copy matching files to
             search_term: Term to search for (case insensitive)
             doc_type: Type of document to search for (txt, xml, etc.). Only txt files are supported currently.
+            max_workers: Number of worker processes. Defaults to the number of CPUs.
+            link: Hard link the matching files instead of copying them, when source and destination share a filesystem.
+                  The linked files share their contents with the source, so editing one edits both.
         """
         # Create destination directory if it doesn't exist
         Path(self.dest_dir).mkdir(parents=True, exist_ok=True)
@@ -34,52 +148,90 @@ class Files:
         matching_files = 0
         total_matches = 0
         
-        # Compile regex pattern for case-insensitive search
-        patterns = [re.compile(term, re.IGNORECASE) for term in search_terms]
+        # Compile regex patterns for case-insensitive search: one per term for counting, and all
+        # terms combined in a single alternation to find matching files in one pass, when their
+        # meaning allows it (otherwise each file is matched term by term). When every term
+        # is plain ASCII text they are compiled as bytes patterns, which match UTF-8 text directly
+        # without decoding it. Regexes keep the str patterns, where \b, \w, . and IGNORECASE work on characters
+        as_bytes = all(_is_plain_ascii(term) for term in search_terms)
+        encode = (lambda term: term.encode()) if as_bytes else (lambda term: term)
+        patterns = [re.compile(encode(term), re.IGNORECASE) for term in search_terms]
+        combined = _combine(search_terms, patterns, encode)
         
-        # Process all .txt files
-        for txt_file in Path(self.source_dir).glob(f"*.{doc_type}"):
-            total_files += 1
-            try:
-                with open(txt_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    matches = [pattern.findall(content) for pattern in patterns]
-                    
-                    # Check if any of the pattern lists contain matches
-                    has_matches = any(len(match_list) > 0 for match_list in matches)
-                    
-                    if has_matches:
-                        # Copy file to destination
-                        shutil.copy2(txt_file, self.dest_dir)
-                        matching_files += 1
-                        total_matches += len(matches)
-                        print(f"Found {len(matches)} matches in: {txt_file.name}")
+        # List the .txt files with one directory scan. Like a *.txt Path.glob, hidden files are included,
+        # and the cached entry types skip directories without a stat call per file
+        suffix = f".{doc_type}"
+        with os.scandir(self.source_dir) as entries:
+            txt_files = [Path(entry.path) for entry in entries if entry.name.endswith(suffix) and entry.is_file()]
+        
+        # Process all .txt files, in order, in chunks large enough to amortize the pickling
+        scan = partial(_scan, combined=combined, patterns=patterns)
+        copy = _link_or_copy if link else shutil.copy2
+        copies = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+             ThreadPoolExecutor(max_workers=_COPY_WORKERS) as copier:
+            for txt_file, num_matches, error in executor.map(scan, txt_files, chunksize=64):
+                total_files += 1
+                if error is not None:
+                    logger.warning("Error processing %s: %s", txt_file, error)
+                    continue
+                
+                if num_matches > 0:
+                    # Copy file to destination
+                    copies.append((txt_file, num_matches, copier.submit(copy, txt_file, self.dest_dir)))
+            
+            # Report the copies in file order
+            for txt_file, num_matches, copy in copies:
+                try:
+                    copy.result()
+                    matching_files += 1
+                    total_matches += num_matches
+                    logger.info("Found %d matches in: %s", num_matches, txt_file.name)
                         
-            except Exception as e:
-                print(f"Error processing {txt_file}: {str(e)}")
+                except Exception as e:
+                    logger.warning("Error processing %s: %s", txt_file, e)
         
-        # Print statistics
-        print("\nSearch Results:")
-        print("=" * 50)
-        print(f"Total files processed: {total_files}")
-        print(f"Files containing matches: {matching_files}")
-        print(f"Total occurrences found: {total_matches}")
-        print(f"Matching files copied to: {self.dest_dir}")
+        # Print statistics in one write
+        print("\n".join([
+            "\nSearch Results:",
+            "=" * 50,
+            f"Total files processed: {total_files}",
+            f"Files containing matches: {matching_files}",
+            f"Total occurrences found: {total_matches}",
+            f"Matching files copied to: {self.dest_dir}",
+        ]))
 
 
-    def copy_files(self, ids: list = [], doc_type: str = "txt"):
+    def copy_files(self, ids: list = [], doc_type: str = "txt", link: bool = False):
         """
         Copy all files from source directory to destination directory.
         Note that the files are named as {db}_{id}.{doc_type} ex: pmc_32792685.txt
         
         Args:
-            ids: List of PMC IDs to copy
+            ids: List of PMC IDs to copy. IDs without a file are removed from the list.
+            link: Hard link the files instead of copying them, as in search_and_copy_files.
         """
+        # One directory listing instead of an exists() check per file
+        existing_files = set(os.listdir(self.source_dir))
+        
+        # File names and paths are built by concatenation to the fixed parts, computed once
+        prefix, suffix = f"{self.db}_", f".{doc_type}"
+        source_prefix = os.path.join(self.source_dir, "")
+        
+        kept = []
+        sources = []
         for id in ids:
-            file = Path(self.source_dir) / f"{self.db}_{id}.{doc_type}"
-            if not file.exists():
-                print(f"File {file.name} does not exist")
-                ids.remove(id)
+            filename = f"{prefix}{id}{suffix}"
+            if filename not in existing_files:
+                logger.warning("File %s does not exist", filename)
                 continue
-            shutil.copy2(file, self.dest_dir)
+            sources.append(source_prefix + filename)
+            kept.append(id)
+        
+        # Copy the files from a pool of threads. list() waits for all of them and raises the first error
+        with ThreadPoolExecutor(max_workers=_COPY_WORKERS) as copier:
+            list(copier.map(partial(_link_or_copy if link else shutil.copy2, dst=self.dest_dir), sources))
+        
+        # Remove the missing IDs in place, without mutating the list while iterating over it
+        ids[:] = kept
 
@@ -1,30 +1,31 @@
 import os
 import hashlib
 import tempfile
+from functools import lru_cache
+
+
+# Translation table replacing the characters unsafe in filenames, built once
+_UNSAFE_CHARS_TABLE = str.maketrans({
+    "'": "", '"': "", " ": "_", ":": "_", "[": "_", "]": "_",
+    "/": "_", "\\": "_", "?": "_", "*": "_", "<": "_", ">": "_", "|": "_",
+    "+": "_", "=": "_", ",": "_", ";": "_", ".": "_", "&": "_", "%": "_",
+    "$": "_", "#": "_", "@": "_", "!": "_", "^": "_", "(": "_", ")": "_",
+    "{": "_", "}": "_", "~": "_", "`": "_"
+})
 
 class Functions:
     def __init__(self):
         pass
     
     @staticmethod
+    @lru_cache(maxsize=1024)
     def get_sanitized_filename(filename):
         """
         Get a sanitized filename from a given filename.
         """
         
-        # Create a safe filename by replacing unsafe characters with underscores
-        unsafe_chars = {
-            "'": "", '"': "", " ": "_", ":": "_", "[": "_", "]": "_",
-            "/": "_", "\\": "_", "?": "_", "*": "_", "<": "_", ">": "_", "|": "_",
-            "+": "_", "=": "_", ",": "_", ";": "_", ".": "_", "&": "_", "%": "_",
-            "$": "_", "#": "_", "@": "_", "!": "_", "^": "_", "(": "_", ")": "_",
-            "{": "_", "}": "_", "~": "_", "`": "_"
-        }
-        
-        # First sanitize the term
-        sanitized_term = filename
-        for char, replacement in unsafe_chars.items():
-            sanitized_term = sanitized_term.replace(char, replacement)
+        # Create a safe filename by replacing unsafe characters with underscores, in one pass
+        sanitized_term = filename.translate(_UNSAFE_CHARS_TABLE)
             
         # Remove "_" from the beginning and end of the filename
         sanitized_term = sanitized_term.strip("_")
@@ -39,6 +40,7 @@ class Functions:
         return f"{sanitized_term}_{filename_hash}"
 
     @staticmethod
+    @lru_cache(maxsize=1024)
     def get_tempfile(name):
         # Create a unique identifier with the first 8 characters of the hash of the name
         unique_id = hashlib.md5(name.encode()).hexdigest()[:8]
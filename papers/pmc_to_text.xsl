@@ -0,0 +1,86 @@
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE xsl:stylesheet [
+  <!-- Unicode whitespace (str.isspace) that normalize-space() does not collapse, and as many spaces -->
+  <!ENTITY ws "&#x85;&#xA0;&#x1680;&#x2000;&#x2001;&#x2002;&#x2003;&#x2004;&#x2005;&#x2006;&#x2007;&#x2008;&#x2009;&#x200A;&#x2028;&#x2029;&#x202F;&#x205F;&#x3000;">
+  <!ENTITY sp "                   ">
+
+  <!-- Section title as computed by XmlToDoc.body -->
+  <!ENTITY section-title "concat(normalize-space(translate(title[1], '&ws;', '&sp;')), substring('Untitled Section', 1, 16 * not(title)))">
+]>
+<!--
+  Convert a PubMed Central (PMC) xml document to txt format without metadata: title, abstract and body.
+  The output is the same as XmlToDoc.paper_to_text_without_metadata(), produced entirely by libxslt.
+-->
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:output method="text" encoding="UTF-8"/>
+
+  <!-- Sections with at least one non-empty direct paragraph, grouped by body and title -->
+  <xsl:key name="sections"
+           match="sec[p[normalize-space(translate(., '&ws;', '&sp;'))]]"
+           use="concat(generate-id(ancestor::body[1]), '|', &section-title;)"/>
+
+  <xsl:template match="/">
+    <!-- Title: leading text of the first article-title -->
+    <xsl:variable name="title" select="string((//article-title)[1]/node()[1][self::text()])"/>
+    <xsl:if test="$title != ''">
+      <xsl:text>TITLE&#10;=====&#10;</xsl:text>
+      <xsl:value-of select="$title"/>
+      <xsl:text>&#10;&#10;&#10;</xsl:text>
+    </xsl:if>
+
+    <!-- Abstract: every paragraph of every abstract, one per line -->
+    <xsl:variable name="abstract-lines">
+      <xsl:for-each select="//abstract">
+        <xsl:for-each select=".//p">
+          <xsl:value-of select="normalize-space(translate(., '&ws;', '&sp;'))"/>
+          <xsl:text>&#10;</xsl:text>
+        </xsl:for-each>
+      </xsl:for-each>
+    </xsl:variable>
+    <xsl:variable name="abstract" select="substring($abstract-lines, 1, string-length($abstract-lines) - 1)"/>
+    <xsl:if test="$abstract != ''">
+      <xsl:text>ABSTRACT&#10;========&#10;</xsl:text>
+      <xsl:value-of select="$abstract"/>
+      <xsl:text>&#10;&#10;&#10;</xsl:text>
+    </xsl:if>
+
+    <!-- Body: sections of the first body, merged by title in order of first appearance -->
+    <xsl:text>BODY&#10;====</xsl:text>
+    <xsl:for-each select="(//body)[1]//sec[p[normalize-space(translate(., '&ws;', '&sp;'))]]">
+      <xsl:variable name="section-title" select="&section-title;"/>
+      <xsl:variable name="group" select="key('sections', concat(generate-id(ancestor::body[1]), '|', $section-title))"/>
+      <xsl:if test="generate-id() = generate-id($group[1])">
+        <xsl:text>&#10;&#10;</xsl:text>
+        <xsl:value-of select="$section-title"/>
+        <xsl:text>&#10;</xsl:text>
+        <xsl:call-template name="repeat">
+          <xsl:with-param name="char" select="'-'"/>
+          <xsl:with-param name="count" select="string-length($section-title)"/>
+        </xsl:call-template>
+        <xsl:text>&#10;</xsl:text>
+        <xsl:variable name="content-lines">
+          <xsl:for-each select="$group">
+            <xsl:for-each select="p[normalize-space(translate(., '&ws;', '&sp;'))]">
+              <xsl:value-of select="normalize-space(translate(., '&ws;', '&sp;'))"/>
+              <xsl:text>&#10;</xsl:text>
+            </xsl:for-each>
+          </xsl:for-each>
+        </xsl:variable>
+        <xsl:value-of select="substring($content-lines, 1, string-length($content-lines) - 1)"/>
+      </xsl:if>
+    </xsl:for-each>
+  </xsl:template>
+
+  <!-- Repeat a character count times (the underline below a section title) -->
+  <xsl:template name="repeat">
+    <xsl:param name="char"/>
+    <xsl:param name="count"/>
+    <xsl:if test="$count &gt; 0">
+      <xsl:value-of select="$char"/>
+      <xsl:call-template name="repeat">
+        <xsl:with-param name="char" select="$char"/>
+        <xsl:with-param name="count" select="$count - 1"/>
+      </xsl:call-template>
+    </xsl:if>
+  </xsl:template>
+</xsl:stylesheet>
@@ -0,0 +1,204 @@
+'''
+Classes to keep requests to the Entrez API within NCBI's rate limits.
+'''
+
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """
+    Sliding-window limit on the number of requests per period, shared by all threads.
+
+    The window is proactive: acquire() blocks until a request can be made without going over
+    the limit. update() is reactive: Retry-After and X-RateLimit-Remaining response headers
+    pause every thread until the server is ready for more requests.
+    """
+
+    def __init__(self, limit: int, period: float = 1.0, min_remaining: int = 2):
+        """
+        Args:
+            limit: Maximum number of requests per period (NCBI allows 10/s with an api_key, 3/s without)
+            period: Length of the sliding window in seconds
+            min_remaining: Pause for a period once X-RateLimit-Remaining drops to this value
+        """
+        self.limit          = limit
+        self.period         = period
+        self.min_remaining  = min_remaining
+        self._window        = deque()   # Start times of the requests in the current window
+        self._blocked_until = 0.0
+        self._lock          = threading.Lock()
+
+
+    def acquire(self):
+        """
+        Block until another request can be made, and record it in the window.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0] >= self.period:
+                    self._window.popleft()
+
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if len(self._window) < self.limit:
+                        self._window.append(now)
+                        return
+                    wait = self._window[0] + self.period - now
+            time.sleep(wait)
+
+
+    def update(self, response):
+        """
+        Pause all requests as asked by the rate limit headers of a response.
+        """
+        delay = 0.0
+        retry_after = response.headers.get("Retry-After")
+        remaining   = response.headers.get("X-RateLimit-Remaining")
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = self.period  # HTTP-date form, wait for the next window
+        elif response.status_code == 429:
+            delay = self.period
+        elif remaining is not None and remaining.isdigit() and int(remaining) <= self.min_remaining:
+            delay = self.period
+
+        if delay > 0:
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+
+class ConcurrencyController:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on the number of requests in flight.
+
+    Latency is judged against the server's own recent baseline rather than an absolute target,
+    as an efetch of hundreds of articles takes far longer than an esearch. Each request reports
+    a key (its kind, e.g. the E-utility) and a size (the number of records it asked for), and
+    its latency per record is compared with the lowest latency per record of the same key
+    among the last `window` responses.
+
+    The limit grows by `increase` after each response while the recent mean stays within
+    `tolerance` times that baseline, and is halved when it goes over or the server reports
+    overload (429/502/503) or the connection fails. A 429 collapses it to `minimum` until
+    responses succeed again. After `failure_threshold` consecutive overload failures the
+    circuit opens and no request is started for `cooldown` seconds.
+    """
+
+    OVERLOAD_STATUS = {429, 502, 503}
+
+    def __init__(self, 
+                 initial: int = 4, 
+                 minimum: int = 1, 
+                 maximum: int = 16, 
+                 tolerance: float = 2.0, 
+                 increase: float = 0.5, 
+                 decrease: float = 0.5, 
+                 window: int = 32, 
+                 samples: int = 8, 
+                 failure_threshold: int = 5, 
+                 cooldown: float = 30.0):
+        """
+        Args:
+            initial: Number of requests allowed in flight at the start
+            minimum: Lowest number of requests allowed in flight
+            maximum: Highest number of requests allowed in flight
+            tolerance: Multiple of the baseline latency above which the limit is decreased
+            increase: Amount added to the limit after a fast response
+            decrease: Factor the limit is multiplied by on overload
+            window: Number of recent latencies of each key the baseline is the lowest of
+            samples: Number of recent latencies of each key averaged
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown: Seconds the circuit stays open
+        """
+        self.minimum            = minimum
+        self.maximum            = maximum
+        self.tolerance          = tolerance
+        self.increase           = increase
+        self.decrease           = decrease
+        self.window             = window
+        self.samples            = samples
+        self.failure_threshold  = failure_threshold
+        self.cooldown           = cooldown
+        self.limit              = float(initial)
+        self._baselines         = {}    # Key -> latencies per record of the last `window` responses
+        self._latencies         = {}    # Key -> latencies per record of the last `samples` responses
+        self._in_flight         = 0
+        self._failures          = 0
+        self._open_until        = 0.0
+        self._condition         = threading.Condition()
+
+
+    def acquire(self):
+        """
+        Block until the circuit is closed and a request slot is free, then take the slot.
+        """
+        with self._condition:
+            while True:
+                wait = self._open_until - time.monotonic()
+                if wait <= 0 and self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                self._condition.wait(wait if wait > 0 else None)
+
+
+    def release(self, latency: float, status_code: int = None, key=None, size: int = 1, adjust: bool = True):
+        """
+        Give back a request slot and adjust the limit from the outcome of the request.
+
+        Args:
+            latency: Time the request took in seconds, including reading the response body
+            status_code: HTTP status of the response, or None if the request failed without one
+            key: Kind of request. Latencies are only compared with those of the same kind
+            size: Number of records the request asked for
+            adjust: False to give back the slot without judging the outcome, e.g. when the
+                    request failed for a reason that says nothing about the server's load
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if adjust:
+                self._adjust(latency, status_code, key, size)
+            self._condition.notify_all()
+
+
+    def _adjust(self, latency: float, status_code: int, key, size: int):
+        """
+        Adjust the limit from the outcome of a request. Called with the condition held.
+        """
+        if status_code is not None and status_code < 400:
+            self._failures = 0
+            latency_per_record = latency / max(1, size)
+            baseline = self._baselines.setdefault(key, deque(maxlen=self.window))
+            latencies = self._latencies.setdefault(key, deque(maxlen=self.samples))
+            baseline.append(latency_per_record)
+            latencies.append(latency_per_record)
+            mean_latency = sum(latencies) / len(latencies)
+            if mean_latency <= self.tolerance * min(baseline):
+                self.limit = min(self.maximum, self.limit + self.increase)
+            else:
+                self._decrease()
+        elif status_code is None or status_code in self.OVERLOAD_STATUS:
+            # Overload or connection failure. Other client errors (e.g. an unknown ID) say nothing about load
+            self._failures += 1
+            if status_code == 429:
+                self.limit = self.minimum
+                self._latencies.clear()
+            else:
+                self._decrease()
+            
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._failures = 0
+
+
+    def _decrease(self):
+        """
+        Multiplicative decrease. The averaged latencies restart so one spike only halves the limit once.
+        The baselines are kept, and follow a lasting change of the server latency within `window` responses.
+        """
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self._latencies.clear()
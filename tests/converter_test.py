@@ -0,0 +1,30 @@
+'''
+Check that the XSLT stylesheet and XmlToDoc produce the same paper text.
+'''
+
+import unittest
+from pathlib import Path
+from papers.converter import _convert_one
+from papers.doc import XmlToDoc
+
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
+
+
+class PaperXsltTest(unittest.TestCase):
+
+    def test_samples_match_xml_to_doc(self):
+        """The stylesheet output is byte-for-byte XmlToDoc.paper_to_text_without_metadata()."""
+        xml_files = sorted(SAMPLES_DIR.glob("*.xml"))
+        self.assertTrue(xml_files, f"No sample XML files in {SAMPLES_DIR}")
+
+        for xml_file in xml_files:
+            with self.subTest(xml_file=xml_file.name):
+                data, error = _convert_one((str(xml_file), "paper_without_metadata", "txt"))
+                self.assertIsNone(error)
+                expected = XmlToDoc(str(xml_file)).paper_to_text_without_metadata().encode("utf-8")
+                self.assertEqual(data, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+'''
+Check that Entrez splits a multi-article efetch response into one file per article, and that
+fetch() refetches the IDs of a failed history server page by ID.
+'''
+
+import io
+import os
+import re
+import tempfile
+import unittest
+import requests
+from pathlib import Path
+from papers.doc import XmlToDoc
+from papers.entrez import Entrez
+from papers.functions import Functions
+
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "samples"
+
+HEADER = ('<?xml version="1.0" ?>\n'
+          '<!DOCTYPE pmc-articleset PUBLIC "-//NLM//DTD ARTICLE SET 2.0//EN" '
+          '"https://dtd.nlm.nih.gov/ncbi/pmc/articleset/nlm-articleset-2.0.dtd">\n')
+
+
+def response(status_code=200, content=b""):
+    """A requests.Response with the given status and body, as the session returns with stream=True."""
+    result = requests.Response()
+    result.status_code = status_code
+    result.url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+    result.raw = io.BytesIO(content)
+    return result
+
+
+class FakeSession:
+    """
+    A session answering epost with a WebEnv, failing every efetch from the history server with a
+    503, and answering efetch by ID list with the given articles. Records the params of each efetch.
+    """
+    
+    def __init__(self, articles):
+        self.articles = articles
+        self.history_fetches, self.id_fetches = [], []
+
+    def post(self, url, data=None, **kwargs):
+        return response(content=b"<ePostResult><QueryKey>1</QueryKey><WebEnv>W1</WebEnv></ePostResult>")
+
+    def get(self, url, params=None, **kwargs):
+        if "WebEnv" in params:
+            self.history_fetches.append(params)
+            return response(503)
+        self.id_fetches.append(params)
+        articles = "".join(self.articles[id] for id in params["id"].split(","))
+        return response(content=f"{HEADER}<pmc-articleset>{articles}</pmc-articleset>".encode("utf-8"))
+
+    def close(self):
+        pass
+
+
+def read_articles():
+    """The sample papers as {pmc_id: (xml_file, article element text)}."""
+    articles = {}
+    for xml_file in sorted(SAMPLES_DIR.glob("*.xml")):
+        text = xml_file.read_text(encoding="utf-8")
+        pmc_id = re.search(r'<article-id pub-id-type="pmc">(?:PMC)?(\d+)<', text).group(1)
+        article = text[text.index("<article "):text.rindex("</article>") + len("</article>")]
+        articles[pmc_id] = (xml_file, article)
+    return articles
+
+
+class SaveRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.entrez = Entrez()
+        self.fetch_dir = tempfile.TemporaryDirectory()
+
+        # One response holding the article of every sample, as efetch returns for an ID list
+        self.articles = read_articles()
+        self.response = f"{HEADER}<pmc-articleset>{''.join(a for _, a in self.articles.values())}</pmc-articleset>".encode("utf-8")
+
+    def tearDown(self):
+        self.entrez.close()
+        self.fetch_dir.cleanup()
+
+    def test_each_article_is_saved_to_its_own_file(self):
+        """Every requested article is saved, wrapped like a single-ID response, and gives the same paper as its sample."""
+        self.assertGreater(len(self.articles), 1)
+        ids = list(self.articles)
+
+        saved = self.entrez._save_records(io.BytesIO(self.response), self.fetch_dir.name, "pmc", ids, "xml")
+
+        self.assertEqual(saved, set(ids))
+        self.assertEqual(sorted(os.listdir(self.fetch_dir.name)), sorted(f"pmc_{id}.xml" for id in ids))
+        for id, (xml_file, _) in self.articles.items():
+            with self.subTest(id=id):
+                filepath = os.path.join(self.fetch_dir.name, f"pmc_{id}.xml")
+                with open(filepath, "rb") as f:
+                    self.assertTrue(f.read().startswith(HEADER.encode("utf-8") + b"<pmc-articleset><article "))
+                doc = XmlToDoc(filepath)
+                self.assertEqual(len(doc.root), 1)
+                self.assertEqual(doc.paper_to_text(), XmlToDoc(str(xml_file)).paper_to_text())
+
+    def test_only_requested_articles_are_saved(self):
+        """Articles not asked for are skipped, requested IDs missing from the response are not reported, PMC prefixes match."""
+        first = next(iter(self.articles))
+        ids = [f"PMC{first}", "999999999"]
+
+        saved = self.entrez._save_records(io.BytesIO(self.response), self.fetch_dir.name, "pmc", ids, "xml")
+
+        self.assertEqual(saved, {f"PMC{first}"})
+        self.assertEqual(os.listdir(self.fetch_dir.name), [f"pmc_PMC{first}.xml"])
+
+
+class FetchRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.articles = {id: article for id, (_, article) in read_articles().items()}
+        self.ids = list(self.articles)
+        self.entrez = Entrez()
+        self.entrez.session = FakeSession(self.articles)
+        self.fetch_dir = tempfile.TemporaryDirectory()
+        self.failed_ids_file = Functions.get_tempfile(f"{'_'.join(self.ids[:10])}_failed_ids")
+        self.remove_failed_ids_file()
+
+    def tearDown(self):
+        self.entrez.close()
+        self.fetch_dir.cleanup()
+        self.remove_failed_ids_file()
+
+    def remove_failed_ids_file(self):
+        if os.path.exists(self.failed_ids_file):
+            os.remove(self.failed_ids_file)
+
+    def test_failed_page_is_fetched_again_by_id(self):
+        """A page failing on the history server is refetched by ID list, every paper is saved once and none failed."""
+        papers_processed = self.entrez.fetch(fetch_dir=self.fetch_dir.name, ids=self.ids, db="pmc", retmode="xml")
+
+        session = self.entrez.session
+        self.assertEqual(len(session.history_fetches), 1)
+        self.assertEqual([params["id"].split(",") for params in session.id_fetches], [self.ids])
+        self.assertEqual(papers_processed, len(self.ids))
+        self.assertEqual(sorted(os.listdir(self.fetch_dir.name)), sorted(f"pmc_{id}.xml" for id in self.ids))
+        for id in self.ids:
+            with self.subTest(id=id):
+                self.assertEqual(len(XmlToDoc(os.path.join(self.fetch_dir.name, f"pmc_{id}.xml")).root), 1)
+        with open(self.failed_ids_file) as f:
+            self.assertEqual(f.read(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
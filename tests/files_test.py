@@ -0,0 +1,60 @@
+'''
+Check that Files.search_and_copy_files matches regex search terms as each term does on its own.
+'''
+
+import os
+import tempfile
+import unittest
+from papers.files import Files
+
+
+class SearchAndCopyFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.dest_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.source_dir.cleanup()
+        self.dest_dir.cleanup()
+
+    def search(self, search_terms, files):
+        """Write files ({name: text}) to the source directory, search them and return the names copied."""
+        for name, text in files.items():
+            with open(os.path.join(self.source_dir.name, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        Files(self.source_dir.name, self.dest_dir.name).search_and_copy_files(search_terms, max_workers=1)
+        return sorted(os.listdir(self.dest_dir.name))
+
+    def test_plain_terms(self):
+        """Plain terms match case-insensitively, in any file with one of them."""
+        copied = self.search(["parkinson", "dopamine"], {
+            "pmc_1.txt": "Parkinson disease",
+            "pmc_2.txt": "DOPAMINE levels",
+            "pmc_3.txt": "unrelated",
+        })
+        self.assertEqual(copied, ["pmc_1.txt", "pmc_2.txt"])
+
+    def test_inline_flags(self):
+        """A term with inline global flags does not break the search."""
+        copied = self.search(["(?i)foo", "bar"], {"pmc_1.txt": "FOO", "pmc_2.txt": "none"})
+        self.assertEqual(copied, ["pmc_1.txt"])
+
+    def test_named_groups_in_several_terms(self):
+        """Terms can reuse the same group name."""
+        copied = self.search(["(?P<n>a)x", "(?P<n>b)y"], {"pmc_1.txt": "by", "pmc_2.txt": "ab"})
+        self.assertEqual(copied, ["pmc_1.txt"])
+
+    def test_backreferences(self):
+        """A numbered backreference refers to a group of its own term."""
+        copied = self.search(["(a)", r"(b)\1"], {"pmc_1.txt": "bb", "pmc_2.txt": "b", "pmc_3.txt": "a"})
+        self.assertEqual(copied, ["pmc_1.txt", "pmc_3.txt"])
+
+    def test_regex_classes_match_characters(self):
+        """\\b and . work on characters, not UTF-8 bytes, for ASCII regex terms."""
+        copied = self.search([r"caf\b", "a.b"], {"pmc_1.txt": "café", "pmc_2.txt": "aéb", "pmc_3.txt": "caf au lait"})
+        self.assertEqual(copied, ["pmc_2.txt", "pmc_3.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+'''
+Check the rate limiter and the concurrency controller used by Entrez.
+'''
+
+import time
+import unittest
+from types import SimpleNamespace
+from papers.throttle import ConcurrencyController, RateLimiter
+
+
+def response(status_code=200, **headers):
+    """A stand-in for a requests.Response with only what RateLimiter.update reads."""
+    return SimpleNamespace(status_code=status_code, headers={key.replace("_", "-"): value for key, value in headers.items()})
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def elapsed(self, function):
+        start = time.monotonic()
+        function()
+        return time.monotonic() - start
+
+    def test_sliding_window(self):
+        """Up to limit requests start at once, the next one waits until the oldest leaves the window."""
+        limiter = RateLimiter(limit=3, period=0.2)
+        for _ in range(3):
+            self.assertLess(self.elapsed(limiter.acquire), 0.05)
+        self.assertGreaterEqual(self.elapsed(limiter.acquire), 0.15)
+
+    def test_retry_after(self):
+        """Retry-After pauses every request for that many seconds, even with room in the window."""
+        limiter = RateLimiter(limit=10, period=0.1)
+        limiter.update(response(503, Retry_After="0.3"))
+        self.assertGreaterEqual(self.elapsed(limiter.acquire), 0.25)
+
+    def test_retry_after_http_date(self):
+        """A Retry-After date waits for the next window."""
+        limiter = RateLimiter(limit=10, period=0.2)
+        limiter.update(response(503, Retry_After="Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertGreaterEqual(self.elapsed(limiter.acquire), 0.15)
+
+    def test_too_many_requests(self):
+        """A 429 without Retry-After waits for the next window."""
+        limiter = RateLimiter(limit=10, period=0.2)
+        limiter.update(response(429))
+        self.assertGreaterEqual(self.elapsed(limiter.acquire), 0.15)
+
+    def test_rate_limit_remaining(self):
+        """Requests pause once X-RateLimit-Remaining drops to min_remaining, not before."""
+        limiter = RateLimiter(limit=10, period=0.2, min_remaining=2)
+        limiter.update(response(X_RateLimit_Remaining="3"))
+        self.assertLess(self.elapsed(limiter.acquire), 0.05)
+        limiter.update(response(X_RateLimit_Remaining="2"))
+        self.assertGreaterEqual(self.elapsed(limiter.acquire), 0.15)
+
+
+class ConcurrencyControllerTest(unittest.TestCase):
+
+    def request(self, controller, latency=1.0, status_code=200, key="efetch", size=1, **kwargs):
+        """Run one request through the controller with the given outcome."""
+        controller.acquire()
+        controller.release(latency, status_code, key=key, size=size, **kwargs)
+
+    def test_additive_increase(self):
+        """Steady latencies grow the limit by `increase` per response, up to the maximum."""
+        controller = ConcurrencyController(initial=4, maximum=6, increase=0.5)
+        self.request(controller)
+        self.assertEqual(controller.limit, 4.5)
+        for _ in range(10):
+            self.request(controller)
+        self.assertEqual(controller.limit, 6)
+
+    def test_multiplicative_decrease(self):
+        """A 502/503 or a connection failure halves the limit, down to the minimum."""
+        controller = ConcurrencyController(initial=8, minimum=1, failure_threshold=100)
+        self.request(controller, status_code=503)
+        self.assertEqual(controller.limit, 4)
+        self.request(controller, status_code=None)
+        self.assertEqual(controller.limit, 2)
+        for _ in range(5):
+            self.request(controller, status_code=502)
+        self.assertEqual(controller.limit, 1)
+
+    def test_too_many_requests_collapses_the_limit(self):
+        """A 429 drops the limit straight to the minimum."""
+        controller = ConcurrencyController(initial=12, minimum=2)
+        self.request(controller, status_code=429)
+        self.assertEqual(controller.limit, 2)
+
+    def test_client_errors_are_neutral(self):
+        """Client errors other than 429, and outcomes not adjusted, leave the limit alone."""
+        controller = ConcurrencyController(initial=4)
+        self.request(controller, status_code=404)
+        self.request(controller, status_code=None, adjust=False)
+        self.assertEqual(controller.limit, 4)
+        self.assertEqual(controller._failures, 0)
+
+    def test_circuit_breaker(self):
+        """Consecutive overload failures open the circuit for the cooldown, then it closes with a fresh count."""
+        controller = ConcurrencyController(initial=8, failure_threshold=2, cooldown=0.3)
+        self.request(controller, status_code=503)
+        self.request(controller, status_code=503)
+
+        start = time.monotonic()
+        controller.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        controller.release(1.0, 200)
+
+        # The count restarts after the circuit opens, and after a success
+        self.request(controller, status_code=503)
+        self.request(controller, status_code=200)
+        self.request(controller, status_code=503)
+        start = time.monotonic()
+        controller.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+    def test_slow_requests_are_judged_against_the_baseline(self):
+        """Latency is not compared with an absolute target but with the lowest recent latency."""
+        controller = ConcurrencyController(initial=4, maximum=16, tolerance=2.0)
+        for _ in range(18):
+            self.request(controller, latency=1.0)
+        self.assertEqual(controller.limit, 13)
+
+        # One slow response is averaged out, a sustained slowdown to three times the baseline is not
+        self.request(controller, latency=3.0)
+        self.assertEqual(controller.limit, 13.5)
+        for _ in range(4):
+            self.request(controller, latency=3.0)
+        self.assertLess(controller.limit, 13.5)
+
+    def test_baseline_per_key_and_record(self):
+        """Fast requests of another kind, and small requests, do not make a fetch look slow."""
+        controller = ConcurrencyController(initial=4, maximum=16, tolerance=2.0)
+        self.request(controller, latency=1.0, size=500)
+        self.request(controller, latency=0.05, key="epost")
+        self.request(controller, latency=1.0, size=500)
+        self.request(controller, latency=0.1, size=40)
+        self.request(controller, latency=1.0, size=500)
+        self.assertEqual(controller.limit, 6.5)
+
+
+if __name__ == "__main__":
+    unittest.main()